@@ -1,18 +1,60 @@
-
-import os, json, pandas as pd
-from functools import lru_cache
-from dash import Dash, html, dcc, dash_table, Input, Output, no_update
-import plotly.express as px
-import plotly.graph_objects as go
+import os, re, gc, sys, glob, gzip, zlib, json, time, random, hashlib, shutil, weakref, threading, subprocess, cProfile
+import unicodedata, multiprocessing
+import numpy as np, pandas as pd
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from urllib.parse import urlencode
+from flask import Response, g, has_request_context, request
+from dash import Dash, html, dcc, dash_table, ClientsideFunction, Input, Output, State, Patch, no_update
+from plotly.io.json import to_json_plotly
+# plotly.express / plotly.graph_objects se importan dentro de las funciones que arman figuras:
+# el import de app.py (y el primer layout) no paga su costo
 
 # --------------------------------------------------------------------------------------
 # Config
 # --------------------------------------------------------------------------------------
 DATA_DIR = os.environ.get("DATA_DIR", "data")
+# Uno o varios libros de mortalidad: nombre, glob (NoFetal20*.xlsx) o lista separada por comas
 MORTALITY_FILE = os.environ.get("MORTALITY_FILE", "NoFetal2019.xlsx")
 CAUSES_FILE = os.environ.get("CAUSES_FILE", "CodigosDeMuerte.xlsx")
 DIVIPOLA_FILE = os.environ.get("DIVIPOLA_FILE", "Divipola.xlsx")
 GEOJSON_FILE = os.environ.get("GEOJSON_FILE", "colombia_departamentos.geojson")
+# Capa municipal partida por departamento (tools/make_geojson.py --mpios): <COD_DEPTO>.geojson
+MPIOS_DIR = os.environ.get("MPIOS_DIR", os.path.join(DATA_DIR, "mpios"))
+
+# Snapshot columnar (un .npy por columna) que evita re-parsear los Excel en cada worker
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(DATA_DIR, ".snapshot"))
+USE_SNAPSHOT = os.environ.get("USE_SNAPSHOT", "1") != "0"
+# Ruta fija a un snapshot ya construido (se usa tal cual, sin leer ni verificar los archivos fuente)
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+# Carga los datos al importar (master de gunicorn con preload_app) para compartirlos entre workers
+PRELOAD_DATA = os.environ.get("PRELOAD_DATA", "0") == "1"
+# Arranque sin bloquear: el layout sale de inmediato y un hilo carga datos y paneles al arrancar
+WARM_START = os.environ.get("WARM_START", "0") == "1"
+SNAPSHOT_FORMAT = 2  # súbelo si cambia la forma de `std` para invalidar snapshots viejos
+# Cada cuántos segundos revisar si cambiaron los archivos fuente (0 = sin recarga en caliente)
+DATA_WATCH_SECONDS = float(os.environ.get("DATA_WATCH_SECONDS", 0))
+
+# Presupuesto (bytes JSON) del cache LRU de paneles, compartido por todas las sesiones del worker
+PANEL_CACHE_BYTES = int(os.environ.get("PANEL_CACHE_BYTES", 64 * 1024 * 1024))
+DEFAULT_HOMICIDE_CODES = os.environ.get("HOMICIDE_CODES", "X93,X94,X95,Y09")
+
+# Cambio de año en el navegador: un paquete de agregados por sesión y callbacks clientside
+CLIENTSIDE_PANELS = os.environ.get("CLIENTSIDE_PANELS", "0") == "1"
+
+# Ingesta de varios libros: procesos en paralelo (0 = uno por CPU) y filas por bloque de lectura
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 0))
+INGEST_CHUNK_ROWS = int(os.environ.get("INGEST_CHUNK_ROWS", 100_000))
+
+# Instrumentación opcional: histogramas por etapa en /metrics (formato texto de Prometheus)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+# Si se define, guarda un cProfile (.prof) de los callbacks muestreados que superen PROFILE_SLOW_MS
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+PROFILE_SAMPLE = float(os.environ.get("PROFILE_SAMPLE", 0.1))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 500))
 
 # Posibles nombres de columnas según EEVV DANE
 COLS = {
@@ -50,53 +92,262 @@ def map_age(x: object) -> str:
     if v == 29:       return "Edad desconocida"
     return "Desconocido"
 
+# Tabla de búsqueda GRUPO_EDAD1 (0–29) -> categoría, equivalente vectorizado de map_age
+AGE_LUT = np.array([map_age(v) for v in range(30)], dtype=object)
+
+def age_labels(codes):
+    """Aplica map_age a una serie de códigos GRUPO_EDAD1 sin iterar fila por fila."""
+    v = np.trunc(pd.to_numeric(pd.Series(codes), errors="coerce").to_numpy(dtype=float))
+    ok = (v >= 0) & (v < len(AGE_LUT))  # NaN queda fuera de ambos lados
+    out = np.full(len(v), "Desconocido", dtype=object)
+    out[ok] = AGE_LUT[v[ok].astype(int)]
+    return out
+
 def _first_existing_column(df, candidates):
     for c in candidates:
         if c in df.columns:
             return c
     return None
 
+# --------------------------------------------------------------------------------------
+# Métricas (histogramas en memoria, formato texto de Prometheus)
+# --------------------------------------------------------------------------------------
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROWS_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+BYTES_BUCKETS = (256, 1024, 4096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304)
+
+class Metrics:
+    """Registro thread-safe de histogramas por proceso (cada worker expone los suyos)."""
+
+    def __init__(self):
+        self._families = OrderedDict()  # nombre -> (ayuda, buckets)
+        self._series = {}               # (nombre, etiquetas) -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets):
+        self._families[name] = (help_text, tuple(buckets))
+
+    def observe(self, name, value, **labels):
+        buckets = self._families[name][1]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        lines = []
+        for name, (help_text, buckets) in self._families.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (sname, labels), (counts, total, n) in sorted(series.items(), key=lambda kv: kv[0]):
+                if sname != name:
+                    continue
+                for bound, c in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', f'{bound:g}')])} {c}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {n}")
+                lines.append(f"{name}_sum{fmt(labels)} {total:.6g}")
+                lines.append(f"{name}_count{fmt(labels)} {n}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+METRICS.histogram("mortalidad_load_seconds", "Duración de cada etapa de carga de datos.", SECONDS_BUCKETS)
+METRICS.histogram("mortalidad_load_rows", "Filas producidas por cada etapa de carga.", ROWS_BUCKETS)
+METRICS.histogram("mortalidad_panel_seconds", "Duración de cada etapa de un panel (agregación, figura, json).", SECONDS_BUCKETS)
+METRICS.histogram("mortalidad_panel_rows", "Filas del cubo que entran a la agregación de cada panel.", ROWS_BUCKETS)
+METRICS.histogram("mortalidad_callback_seconds", "Duración total de cada callback de Dash.", SECONDS_BUCKETS)
+METRICS.histogram("mortalidad_callback_response_bytes", "Tamaño de la respuesta de cada callback.", BYTES_BUCKETS)
+
+class _Stage:
+    """Lo que el bloque medido puede reportar además del tiempo (filas procesadas)."""
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = None
+
+@contextmanager
+def timed(family, **labels):
+    """Mide el bloque en `mortalidad_{family}_seconds` (y `_rows` si se asigna `stage.rows`).
+
+    Sin METRICS_ENABLED no mide nada; el bloque corre igual.
+    """
+    stage = _Stage()
+    if not METRICS_ENABLED:
+        yield stage
+        return
+    t0 = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        METRICS.observe(f"mortalidad_{family}_seconds", time.perf_counter() - t0, **labels)
+        if stage.rows is not None:
+            METRICS.observe(f"mortalidad_{family}_rows", stage.rows, **labels)
+
 # --------------------------------------------------------------------------------------
 # Carga de datos (con cache)
 # --------------------------------------------------------------------------------------
-@lru_cache(maxsize=1)
-def load_data():
-    mort_path    = os.path.join(DATA_DIR, MORTALITY_FILE)
+def _mortality_paths():
+    """Libros de mortalidad según MORTALITY_FILE (los globs se expanden en orden alfabético)."""
+    paths = []
+    for pattern in (p.strip() for p in MORTALITY_FILE.split(",") if p.strip()):
+        full = os.path.join(DATA_DIR, pattern)
+        matches = sorted(glob.glob(full)) if glob.has_magic(pattern) else [full]
+        # Un glob sin coincidencias queda como ruta literal para que _check_sources lo reporte
+        paths.extend(matches or [full])
+    return list(dict.fromkeys(paths))
+
+def _source_paths():
+    """Rutas de los archivos fuente (en orden estable) que alimentan `std`."""
+    paths = _mortality_paths() + [
+        os.path.join(DATA_DIR, CAUSES_FILE),
+        os.path.join(DATA_DIR, DIVIPOLA_FILE),
+    ]
+    cleaned_csv = os.path.join(DATA_DIR, "CodigosDeMuerte.cleaned.csv")
+    if os.path.exists(cleaned_csv):
+        paths.append(cleaned_csv)
+    return paths
+
+def _check_sources():
+    for path in _source_paths():
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No se encontró {path}.")
+
+def build_std():
+    """Lee los Excel/CSV fuente y arma el dataset estándar `std` (solo códigos) y sus tablas de nombres."""
+    mort_paths   = _mortality_paths()
     causes_path  = os.path.join(DATA_DIR, CAUSES_FILE)
     divipola_path= os.path.join(DATA_DIR, DIVIPOLA_FILE)
-    geojson_path = os.path.join(DATA_DIR, GEOJSON_FILE)
-
-    if not os.path.exists(mort_path):
-        raise FileNotFoundError(f"No se encontró {mort_path}.")
-    if not os.path.exists(causes_path):
-        raise FileNotFoundError(f"No se encontró {causes_path}.")
-    if not os.path.exists(divipola_path):
-        raise FileNotFoundError(f"No se encontró {divipola_path}.")
+    _check_sources()
 
-    # 1) Mortalidad
-    df = pd.read_excel(mort_path, engine="openpyxl")
+    # 1) Mortalidad: cada libro se lee y estandariza por separado (en paralelo si son varios)
+    with timed("load", stage="excel_mortalidad") as st:
+        std = read_mortality(mort_paths)
+        st.rows = len(std)
 
     # 2) Catálogo de causas (intenta CSV limpio primero; si no, parsea Excel del DANE)
-    cleaned_csv = os.path.join(DATA_DIR, "CodigosDeMuerte.cleaned.csv")
-    if os.path.exists(cleaned_csv):
-        causas = pd.read_csv(cleaned_csv, dtype=str)
-    else:
-        tmp = pd.read_excel(causes_path, sheet_name="Final", header=8, engine="openpyxl")
-        tmp.columns = [str(c).strip() for c in tmp.columns]
-        causas = tmp.rename(columns={
-            "Código de la CIE-10 cuatro caracteres": "COD_CAUSA",
-            "Descripcion  de códigos mortalidad a cuatro caracteres": "NOMBRE_CAUSA",
-        })
+    with timed("load", stage="causas") as st:
+        cleaned_csv = os.path.join(DATA_DIR, "CodigosDeMuerte.cleaned.csv")
+        if os.path.exists(cleaned_csv):
+            causas = pd.read_csv(cleaned_csv, dtype=str)
+        else:
+            tmp = pd.read_excel(causes_path, sheet_name="Final", header=8, engine="openpyxl")
+            tmp.columns = [str(c).strip() for c in tmp.columns]
+            causas = tmp.rename(columns={
+                "Código de la CIE-10 cuatro caracteres": "COD_CAUSA",
+                "Descripcion  de códigos mortalidad a cuatro caracteres": "NOMBRE_CAUSA",
+            })
+        st.rows = len(causas)
 
     # 3) DIVIPOLA (departamentos y municipios)
-    divipola = pd.read_excel(divipola_path, engine="openpyxl")
+    with timed("load", stage="divipola") as st:
+        divipola = pd.read_excel(divipola_path, engine="openpyxl")
+        st.rows = len(divipola)
+
+    with timed("load", stage="dimensiones") as st:
+        dims = build_dims(causas, divipola)
+        st.rows = sum(len(d) for d in dims.values())
+    return std, dims
+
+def read_mortality(paths):
+    """Lee y estandariza los libros de mortalidad y los une en un solo `std`.
+
+    Cada libro va a un proceso del pool (hasta INGEST_WORKERS) y se lee en streaming: solo
+    las columnas que detecta `COLS` en sus propios encabezados, en bloques de INGEST_CHUNK_ROWS.
+    """
+    workers = min(len(paths), INGEST_WORKERS or os.cpu_count() or 1)
+    # Durante el import de app.py (precarga) el pool no puede importar este módulo: en serie
+    if workers <= 1 or not _IMPORTED:
+        parts = [_read_mortality_file(p) for p in paths]
+    else:
+        # spawn y no fork: se llama desde hilos (arranque, watcher) y un fork con otros hilos vivos
+        # puede heredar locks tomados. Los procesos del pool importan app.py sin cargar nada.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(_read_mortality_file, paths))
+    return concat_std(parts)
+
+def _mortality_columns(header):
+    """Posición de cada columna que usa `standardize_rows` dentro de `header` (ya normalizado)."""
+    wanted = {}
+    for key in ("fecha_defuncion", "anio", "mes", "depto", "muni", "sexo", "causa", "grupo_edad"):
+        for name in COLS[key]:
+            if name in header:
+                wanted[name] = header.index(name)
+                break
+    return wanted
 
-    # Normaliza encabezados
-    df.columns       = [c.strip().upper() for c in df.columns]
-    causas.columns   = [c.strip().upper() for c in causas.columns]
-    divipola.columns = [c.strip().upper() for c in divipola.columns]
+def _read_mortality_file(path):
+    """`std` de un solo libro, leído fila a fila con openpyxl en modo solo lectura."""
+    from openpyxl import load_workbook
 
-    # Detecta columnas
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(c).strip().upper() if c is not None else "" for c in next(rows, ())]
+        wanted = _mortality_columns(header)
+        names, idx = list(wanted), list(wanted.values())
+        chunks, buf = [], []
+        for row in rows:
+            buf.append([row[i] if i < len(row) else None for i in idx])
+            if len(buf) >= INGEST_CHUNK_ROWS:
+                chunks.append(_standardize_chunk(buf, names))
+                buf = []
+        if buf or not chunks:
+            chunks.append(_standardize_chunk(buf, names))
+    finally:
+        wb.close()
+    return concat_std(chunks)
+
+def _standardize_chunk(rows, names):
+    # Celdas vacías como NaN y tipos inferidos, igual que pd.read_excel
+    df = pd.DataFrame(rows, columns=names, dtype=object)
+    return standardize_rows(df.where(df.notna(), np.nan).infer_objects())
+
+def _text_category(s):
+    """`s` como categoría de texto; los faltantes siguen faltando (no pasan a "nan" ni "<NA>")."""
+    codes, uniques = pd.factorize(s)  # faltantes -> -1, que toma el último elemento de `labels`
+    labels = [str(int(v)) if isinstance(v, float) and v.is_integer() else str(v) for v in uniques]
+    return pd.Series(np.array(labels + [np.nan], dtype=object)[codes], dtype="category")
+
+def concat_std(parts):
+    """Une frames `std` (bloques o libros): categorías unificadas y enteros re-compactados."""
+    parts = [p for p in parts if p is not None]
+    if len(parts) == 1:
+        return parts[0]
+    out = {}
+    for col in parts[0].columns:
+        series = [p[col] for p in parts]
+        if all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            out[col] = pd.Series(pd.api.types.union_categoricals(series, sort_categories=True))
+        elif any(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            # Un libro trae la columna como texto y otro como número: todo pasa a categoría de texto
+            out[col] = pd.Series(pd.api.types.union_categoricals(
+                [_text_category(s) for s in series], sort_categories=True))
+        else:
+            out[col] = _compact_codes(pd.concat(series, ignore_index=True))
+    return pd.DataFrame(out)
+
+def standardize(df, causas, divipola):
+    """Arma `std` y sus tablas de nombres a partir de los frames crudos (mortalidad, causas, DIVIPOLA)."""
+    return standardize_rows(df), build_dims(causas, divipola)
+
+def standardize_rows(df):
+    """`std` (solo códigos, enteros pequeños y categorías) a partir de un frame crudo de mortalidad."""
+    df.columns = [str(c).strip().upper() for c in df.columns]
+
+    # Detecta columnas (por frame: los encabezados cambian entre años)
     fecha_col = _first_existing_column(df, COLS["fecha_defuncion"])
     anio_col  = _first_existing_column(df, COLS["anio"])
     mes_col   = _first_existing_column(df, COLS["mes"])
@@ -119,6 +370,27 @@ def load_data():
         if c and c in df.columns:
             df[c] = pd.to_numeric(df[c], errors="coerce")
 
+    # Dataset estándar para graficar: solo códigos, con enteros pequeños y categorías
+    def col(c):
+        return df[c] if c in df.columns else pd.Series(pd.NA, index=df.index)
+
+    std = pd.DataFrame(index=df.index)
+    std["ANIO"]        = _compact_codes(col(anio_col))
+    std["MES"]         = _compact_codes(col(mes_col))
+    std["COD_DEPTO"]   = _compact_codes(col(dpto_col))
+    std["COD_MPIO"]    = _compact_codes(col(muni_col))
+    sexo = col(sexo_col)
+    std["SEXO"]        = _compact_codes(sexo) if pd.api.types.is_numeric_dtype(sexo) else sexo.astype("category")
+    std["COD_CAUSA"]   = (df[causa_col].astype(str).str.upper().str.strip() if causa_col in df.columns
+                          else pd.Series("", index=df.index)).astype("category")
+    std["GRUPO_EDAD1"] = _compact_codes(col(grupo_col))
+    return std.reset_index(drop=True)
+
+def build_dims(causas, divipola):
+    """Tablas de nombres (departamento, municipio, causa) que se unen a los resultados agregados."""
+    causas.columns   = [str(c).strip().upper() for c in causas.columns]
+    divipola.columns = [str(c).strip().upper() for c in divipola.columns]
+
     # Catálogo de causas (limpio)
     causas = causas[["COD_CAUSA", "NOMBRE_CAUSA"]].dropna()
     causas["COD_CAUSA"] = causas["COD_CAUSA"].astype(str).str.upper().str.strip()
@@ -129,36 +401,1006 @@ def load_data():
     muni_code_col = _first_existing_column(divipola, ["COD_MPIO", "COD_MUNICIPIO", "MUNI", "CODIGO_MPIO"])
     muni_name_col = _first_existing_column(divipola, ["NOM_MPIO", "MUNICIPIO", "MPIO_NOM"])
 
-    div_dpto = divipola[[dpto_code_col, dpto_name_col]].drop_duplicates().rename(
-        columns={dpto_code_col: "COD_DEPTO", dpto_name_col: "NOM_DEPTO"}
-    )
-    div_muni = divipola[[dpto_code_col, muni_code_col, muni_name_col]].drop_duplicates().rename(
-        columns={dpto_code_col: "COD_DEPTO", muni_code_col: "COD_MPIO", muni_name_col: "NOM_MPIO"}
-    )
+    dims = {
+        "depto": divipola[[dpto_code_col, dpto_name_col]].drop_duplicates().rename(
+            columns={dpto_code_col: "COD_DEPTO", dpto_name_col: "NOM_DEPTO"}
+        ),
+        "mpio": divipola[[dpto_code_col, muni_code_col, muni_name_col]].drop_duplicates().rename(
+            columns={dpto_code_col: "COD_DEPTO", muni_code_col: "COD_MPIO", muni_name_col: "NOM_MPIO"}
+        ),
+        "causa": causas.drop_duplicates("COD_CAUSA"),
+    }
+    for dim in dims.values():
+        dim.reset_index(drop=True, inplace=True)
+    return dims
+
+def _compact_codes(s):
+    """Convierte una columna de códigos al entero nullable más pequeño (float si trae decimales)."""
+    v = pd.to_numeric(s, errors="coerce")
+    present = v.dropna()
+    if not (present == np.trunc(present)).all():
+        return v
+    lo, hi = (present.min(), present.max()) if len(present) else (0, 0)
+    for dtype in ("Int8", "Int16", "Int32"):
+        info = np.iinfo(dtype.lower())
+        if info.min <= lo and hi <= info.max:
+            return v.astype(dtype)
+    return v.astype("Int64")
+
+# --------------------------------------------------------------------------------------
+# Snapshot columnar en disco
+# --------------------------------------------------------------------------------------
+def data_fingerprint():
+    """Huella de los archivos fuente + mapeo `COLS`; cambia si cambia cualquier insumo."""
+    h = hashlib.sha1()
+    h.update(json.dumps({"format": SNAPSHOT_FORMAT, "cols": COLS}, sort_keys=True).encode("utf-8"))
+    for path in _source_paths():
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def _snapshot_path(fingerprint):
+    return os.path.join(SNAPSHOT_DIR, f"std-{fingerprint}")
+
+def _json_scalar(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+def write_frame(df, path):
+    """Escribe `df` como un .npy por columna (+ máscara de nulos; las categorías van en meta.json)."""
+    os.makedirs(path)
+    meta = {"rows": len(df), "columns": []}
+    for col in df.columns:
+        s = df[col]
+        entry = {"name": col}
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            values = s.cat.codes.to_numpy()
+            entry.update(kind="cat", categories=[_json_scalar(v) for v in s.cat.categories.tolist()])
+        elif isinstance(s.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(s):
+            values = s.to_numpy(dtype=s.dtype.numpy_dtype, na_value=0)
+            entry.update(kind="int", dtype=str(s.dtype))
+            if s.isna().any():
+                np.save(os.path.join(path, f"{col}.mask.npy"), s.isna().to_numpy())
+                entry["mask"] = True
+        elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            values = s.to_numpy()
+            entry.update(kind="num")
+        else:
+            codes, uniques = pd.factorize(s)
+            values = codes.astype(np.int32)
+            entry.update(kind="obj", categories=[_json_scalar(v) for v in uniques.tolist()])
+        np.save(os.path.join(path, f"{col}.npy"), values)
+        meta["columns"].append(entry)
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+def read_frame(path):
+    """Abre un frame escrito por `write_frame` con memory-map (sin copiar los arreglos)."""
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    cols = {}
+    for c in meta["columns"]:
+        arr = np.load(os.path.join(path, f"{c['name']}.npy"), mmap_mode="r")
+        if c["kind"] == "cat":
+            cols[c["name"]] = pd.Categorical.from_codes(arr, categories=c["categories"], validate=False)
+        elif c["kind"] == "int":
+            mask = (np.load(os.path.join(path, f"{c['name']}.mask.npy"), mmap_mode="r") if c.get("mask")
+                    else np.zeros(len(arr), dtype=bool))
+            cols[c["name"]] = pd.arrays.IntegerArray(arr, mask)
+        elif c["kind"] == "num":
+            cols[c["name"]] = arr
+        else:
+            # El último elemento es el NaN al que apuntan los códigos -1
+            lookup = np.array(c["categories"] + [np.nan], dtype=object)
+            cols[c["name"]] = lookup[arr]
+    return pd.DataFrame(cols, copy=False)
+
+def write_snapshot(std, dims, path):
+    """Escribe `std` y sus tablas de dimensión en `path` de forma atómica."""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    write_frame(std, os.path.join(tmp, "std"))
+    for name, dim in dims.items():
+        write_frame(dim, os.path.join(tmp, f"dim_{name}"))
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Otro proceso lo publicó primero: el suyo es equivalente
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+def read_snapshot(path):
+    """Abre un snapshot: devuelve (`std`, dims) respaldados por memory-map."""
+    std = read_frame(os.path.join(path, "std"))
+    dims = {name[len("dim_"):]: read_frame(os.path.join(path, name))
+            for name in sorted(os.listdir(path)) if name.startswith("dim_")}
+    return std, dims
+
+def build_snapshot(force=False):
+    """Construye (si hace falta) el snapshot de los insumos actuales y devuelve su ruta."""
+    _check_sources()
+    fingerprint = data_fingerprint()
+    path = _snapshot_path(fingerprint)
+    if force:
+        shutil.rmtree(path, ignore_errors=True)
+    if not os.path.exists(path):
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        with _snapshot_lock():
+            # Otro proceso pudo construirlo mientras esperábamos el lock
+            if not os.path.exists(path):
+                std, dims = build_std()
+                with timed("load", stage="snapshot_escritura") as st:
+                    write_snapshot(std, dims, path)
+                    st.rows = len(std)
+            # Limpia snapshots de huellas anteriores (quien aún los tenga mapeados los sigue leyendo)
+            for name in os.listdir(SNAPSHOT_DIR):
+                old = os.path.join(SNAPSHOT_DIR, name)
+                if name.startswith("std-") and old != path and ".tmp-" not in name:
+                    shutil.rmtree(old, ignore_errors=True)
+    return path
 
-    # Dataset estándar para graficar
-    std = pd.DataFrame()
-    std["ANIO"]        = df[anio_col] if anio_col in df.columns else pd.NA
-    std["MES"]         = df[mes_col] if mes_col in df.columns else pd.NA
-    std["COD_DEPTO"]   = df[dpto_col] if dpto_col in df.columns else pd.NA
-    std["COD_MPIO"]    = df[muni_col] if muni_col in df.columns else pd.NA
-    std["SEXO"]        = df[sexo_col] if sexo_col in df.columns else pd.NA
-    std["COD_CAUSA"]   = df[causa_col].astype(str).str.upper().str.strip() if causa_col in df.columns else ""
-    std["GRUPO_EDAD1"] = df[grupo_col] if grupo_col in df.columns else pd.NA
-
-    # Enriquecimiento con nombres
-    std = std.merge(div_dpto, on="COD_DEPTO", how="left")
-    std = std.merge(div_muni, on=["COD_DEPTO", "COD_MPIO"], how="left")
-    std = std.merge(causas, on="COD_CAUSA", how="left")
-
-    # GeoJSON opcional (fallback a barras si falta)
+@contextmanager
+def _snapshot_lock():
+    """Serializa la construcción entre procesos: varios workers pueden detectar el mismo cambio."""
+    try:
+        import fcntl
+    except ImportError:  # sin flock (Windows): write_snapshot sigue siendo atómico
+        yield
+        return
+    with open(os.path.join(SNAPSHOT_DIR, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+@lru_cache(maxsize=1)
+def load_geojson():
+    """GeoJSON departamental opcional (None si falta: el mapa cae a barras)."""
+    geojson_path = os.path.join(DATA_DIR, GEOJSON_FILE)
     if not os.path.exists(geojson_path):
-        geojson = None
+        return None
+    with open(geojson_path, "r", encoding="utf-8") as gjf:
+        return json.load(gjf)
+
+@lru_cache(maxsize=None)
+def load_mpios_geojson(depto):
+    """GeoJSON municipal de un solo departamento (None si falta: el detalle cae a barras)."""
+    path = os.path.join(MPIOS_DIR, f"{int(depto):02d}.geojson")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as gjf:
+        return json.load(gjf)
+
+def _load_version():
+    """Carga los insumos actuales como una `DataVersion` (el cubo se arma al primer uso)."""
+    # Con precarga siempre se pasa por el snapshot: sus arreglos memory-mapped (solo lectura)
+    # quedan en el page cache y los comparten todos los workers
+    path = SNAPSHOT_PATH
+    if not path and (USE_SNAPSHOT or PRELOAD_DATA):
+        _check_sources()  # un insumo faltante no es un problema del snapshot
+        try:
+            path = build_snapshot()
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir el snapshot en {SNAPSHOT_DIR} ({e}); se carga en memoria", flush=True)
+    if path:
+        with timed("load", stage="snapshot_lectura") as st:
+            std, dims = read_snapshot(path)
+            st.rows = len(std)
+        key = os.path.basename(os.path.normpath(path)).replace("std-", "", 1)
     else:
-        with open(geojson_path, "r", encoding="utf-8") as gjf:
-            geojson = json.load(gjf)
+        key = data_fingerprint()  # antes de leer: un cambio durante la lectura se detecta después
+        std, dims = build_std()
+    return DataVersion(key, std, dims)
+
+# --------------------------------------------------------------------------------------
+# Códigos CIE-10 como enteros y conjuntos de intervalos
+# --------------------------------------------------------------------------------------
+# Cada código se codifica como (letra * 100 + 2 dígitos) * 11 + d, con d = 0 para el código
+# de 3 caracteres y d = 1..10 para el cuarto carácter 0..9. Así "X95" abarca [X95, X959] y un
+# rango como X85-Y09 es un único intervalo entero.
+# DANE rellena con X los códigos sin subcategoría (I10X, R99X): equivalen al código de 3 caracteres
+_CIE10_RE = r"^([A-Z])(\d{2})(\d|X)?$"
+
+def cie10_encode(codes):
+    """Codifica una secuencia de códigos CIE-10 a enteros (-1 si el código no es válido).
+
+    Cada código de 3 caracteres ocupa 11 enteros: el propio código (o su forma con X) y sus 10
+    subcódigos.
+    """
+    parts = pd.Series(codes, dtype=object).astype(str).str.strip().str.upper().str.extract(_CIE10_RE)
+    valid = parts[0].notna().to_numpy()
+    out = np.full(len(parts), -1, dtype=np.int32)
+    if valid.any():
+        p = parts[valid]
+        letter = p[0].map(ord).to_numpy() - ord("A")
+        base = (letter * 100 + p[1].astype(int).to_numpy()) * 11
+        fourth = pd.to_numeric(p[2], errors="coerce").fillna(-1).astype(int).to_numpy() + 1
+        out[valid] = base + fourth
+    return out
+
+def _cie10_bounds(code):
+    """Intervalo [lo, hi] que cubre `code` (3 caracteres incluye todos sus subcódigos; con X, solo él)."""
+    m = re.match(_CIE10_RE, code.strip().upper())
+    if not m:
+        return None
+    v = ((ord(m.group(1)) - ord("A")) * 100 + int(m.group(2))) * 11
+    if not m.group(3):
+        return v, v + 10
+    return (v,) * 2 if m.group(3) == "X" else (v + int(m.group(3)) + 1,) * 2
+
+def _cie10_decode(v, exact=False):
+    """Código de `v`; con `exact`, el código de 3 caracteres sale con X (solo él, sin subcódigos)."""
+    base, d = divmod(v, 11)
+    letter, nn = divmod(base, 100)
+    return f"{chr(ord('A') + letter)}{nn:02d}" + (str(d - 1) if d else "X" if exact else "")
+
+def _merge_intervals(intervals):
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+def parse_cie10(spec):
+    """Convierte una especificación de códigos en una tupla ordenada de intervalos disjuntos.
+
+    Tokens separados por comas (o espacios/punto y coma): códigos de 3 o 4 caracteres
+    (`X95`, `X950`, `I10X`), rangos aunque crucen de letra (`X85-Y09`, `X950-X954`) y exclusiones
+    con `!` (`!X94`, `!X940-X949`). Los tokens inválidos se ignoran.
+    """
+    include, exclude = [], []
+    for tok in str(spec or "").upper().replace(";", ",").replace(" ", ",").split(","):
+        tok = tok.strip()
+        target = include
+        if tok.startswith("!"):
+            tok, target = tok[1:], exclude
+        if not tok:
+            continue
+        a, _, b = tok.partition("-")
+        lo, hi = _cie10_bounds(a), _cie10_bounds(b or a)
+        if lo is None or hi is None:
+            continue
+        if lo[0] > hi[0]:
+            lo, hi = hi, lo
+        target.append((lo[0], hi[1]))
+
+    result = _merge_intervals(include)
+    for x_lo, x_hi in _merge_intervals(exclude):
+        pieces = []
+        for lo, hi in result:
+            if x_hi < lo or x_lo > hi:
+                pieces.append((lo, hi))
+                continue
+            if lo < x_lo:
+                pieces.append((lo, x_lo - 1))
+            if x_hi < hi:
+                pieces.append((x_hi + 1, hi))
+        result = pieces
+    return tuple(result)
+
+def format_cie10(intervals):
+    """Texto canónico de un conjunto de intervalos (p.ej. 'X93-X95, Y09')."""
+    out = []
+    for lo, hi in intervals:
+        if lo % 11 == 0 and hi % 11 == 10:
+            a, b = _cie10_decode(lo), _cie10_decode(hi - 10)
+        else:
+            a, b = _cie10_decode(lo, exact=True), _cie10_decode(hi, exact=True)
+        out.append(a if a == b else f"{a}-{b}")
+    return ", ".join(out)
+
+def cie10_match(encoded, intervals):
+    """Máscara booleana de los enteros `encoded` que caen en algún intervalo (búsqueda binaria)."""
+    encoded = np.asarray(encoded)
+    if not intervals:
+        return np.zeros(len(encoded), dtype=bool)
+    starts = np.array([lo for lo, _ in intervals])
+    ends = np.array([hi for _, hi in intervals])
+    idx = np.searchsorted(starts, encoded, side="right") - 1
+    return (idx >= 0) & (encoded <= ends[np.maximum(idx, 0)])
+
+# --------------------------------------------------------------------------------------
+# Índice del catálogo de causas (búsqueda con autocompletado)
+# --------------------------------------------------------------------------------------
+def normalize_text(text):
+    """Minúsculas sin tildes ni diacríticos, para comparar nombres de causas."""
+    return unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()
+
+class CauseIndex:
+    """Índice en memoria del catálogo de causas: prefijo de código y texto del nombre.
+
+    - Códigos ordenados: un prefijo es un rango que se ubica por bisección.
+    - Nombres normalizados con un índice de trigramas: una subcadena de 3+ caracteres se resuelve
+      intersectando listas de posiciones y verificando solo esos candidatos.
+    - Consultas de 2 caracteres: inicio de palabra, también precalculado.
+    Ninguna consulta recorre el catálogo completo.
+    """
+
+    def __init__(self, codes, names):
+        order = np.argsort(np.asarray(codes, dtype=str), kind="stable")
+        self.codes = [str(codes[i]) for i in order]
+        self.names = [str(names[i]) for i in order]
+        self._norm = [normalize_text(n) for n in self.names]
+        grams, starts = {}, {}
+        for i, text in enumerate(self._norm):
+            for gram in {text[j:j + 3] for j in range(len(text) - 2)}:
+                grams.setdefault(gram, []).append(i)
+            for tok in {t[:2] for t in re.findall(r"\w+", text) if len(t) >= 2}:
+                starts.setdefault(tok, []).append(i)
+        self._grams = {gram: np.array(ids, dtype=np.int32) for gram, ids in grams.items()}
+        self._starts = {t: np.array(ids, dtype=np.int32) for t, ids in starts.items()}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def code_range(self, prefix):
+        """(inicio, fin) de los códigos que empiezan con `prefix`."""
+        prefix = prefix.upper()
+        return bisect_left(self.codes, prefix), bisect_left(self.codes, prefix + "\uffff")
+
+    def _word(self, word):
+        if len(word) < 3:
+            return self._starts.get(word, np.empty(0, dtype=np.int32))
+        lists = sorted((self._grams.get(word[j:j + 3]) for j in range(len(word) - 2)),
+                       key=lambda a: -1 if a is None else len(a))
+        if lists[0] is None:
+            return np.empty(0, dtype=np.int32)
+        ids = lists[0]
+        for other in lists[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+            if not len(ids):
+                return ids
+        if len(word) == 3:
+            return ids
+        return np.array([i for i in ids if word in self._norm[i]], dtype=np.int32)
+
+    def search(self, query, counts=None, limit=20):
+        """Sugerencias para `query`: dicts {code, name, count}, ordenadas por muertes del año.
+
+        Si la consulta parece un código (`X9`, `x95`, `X950`) busca por prefijo de código y, con
+        3 caracteres exactos, agrega además el grupo completo; si no, busca en los nombres.
+        """
+        q = normalize_text(query).strip()
+        if not q:
+            return []
+        out = []
+        if re.fullmatch(r"[a-z]\d{0,3}", q):
+            lo, hi = self.code_range(q)
+            if len(q) == 3 and hi > lo:
+                out.append(self.describe(q.upper(), counts))
+            ids = np.arange(lo, hi, dtype=np.int32)
+        else:
+            # Mismas palabras que al indexar; las de 1 carácter ("y", "a", "de") no filtran nada
+            words = [w for w in re.findall(r"\w+", q) if len(w) >= 2]
+            if not words:
+                return []
+            ids = None
+            for word in words:
+                hits = self._word(word)
+                ids = hits if ids is None else np.intersect1d(ids, hits, assume_unique=True)
+
+        k = limit - len(out)
+        if counts is None:
+            ids = np.sort(ids)[:k]
+        else:
+            if len(ids) > k:
+                ids = ids[np.argpartition(-counts[ids], k)[:k]]
+            ids = ids[np.lexsort((ids, -counts[ids]))]
+        for i in ids:
+            out.append({"code": self.codes[i], "name": self.names[i],
+                        "count": int(counts[i]) if counts is not None else None})
+        return out
+
+    def describe(self, code, counts=None):
+        """{code, name, count} de un código o grupo ya elegido (para mantenerlo entre las opciones)."""
+        lo, hi = self.code_range(code)
+        if hi - lo == 1 and self.codes[lo] == code.upper():
+            return {"code": self.codes[lo], "name": self.names[lo],
+                    "count": int(counts[lo]) if counts is not None else None}
+        total = int(counts[lo:hi].sum()) if counts is not None and hi > lo else None
+        return {"code": code, "name": f"Grupo {code} ({hi - lo} códigos)" if hi > lo else code, "count": total}
+
+def cause_index():
+    """Índice del catálogo de la versión de datos vigente (se arma una vez por versión)."""
+    def build():
+        causa = data_version().dims["causa"]
+        return CauseIndex(causa["COD_CAUSA"].tolist(), causa["NOMBRE_CAUSA"].tolist())
+    return data_version().derived("cause_index", build)
+
+def cause_counts(year):
+    """Muertes del año por causa, alineadas con `cause_index().codes` (precalculado por año)."""
+    def build():
+        _, causas_cube, _ = load_cube()
+        index = cause_index()
+        by_code = rollup(causas_cube[causas_cube["ANIO"] == int(year)], ["COD_CAUSA"])
+        counts = np.zeros(len(index), dtype=np.int64)
+        pos = pd.Index(index.codes).get_indexer(by_code["COD_CAUSA"].astype(str))
+        counts[pos[pos >= 0]] = by_code["TOTAL"].to_numpy()[pos >= 0]
+        return counts
+    return data_version().derived(f"cause_counts:{int(year)}", build)
+
+# --------------------------------------------------------------------------------------
+# Cubo de conteos pre-agregado
+# --------------------------------------------------------------------------------------
+# Dimensiones del cubo principal; COD3 es el prefijo de 3 caracteres de COD_CAUSA
+CUBE_DIMS = ["ANIO", "MES", "COD_DEPTO", "COD_MPIO", "SEXO", "GRUPO_EDAD1", "COD3"]
+
+def keys_size(keys):
+    """Conteo de filas por combinación de claves (conserva NaN como una categoría más)."""
+    return (pd.Series(1, index=keys[0].index)
+            .groupby(keys, dropna=False, observed=True, sort=False).size()
+            .rename("TOTAL").reset_index())
+
+def rollup(cube, by):
+    """Suma TOTAL del cubo por las columnas `by` (descarta claves nulas, como groupby)."""
+    return cube.groupby(by, as_index=False, observed=True)["TOTAL"].sum()
+
+def build_cube(std):
+    """Agrega `std` una sola vez: conteos por CUBE_DIMS y por (ANIO, COD_DEPTO, COD_MPIO, COD_CAUSA)."""
+    # El prefijo se calcula sobre las categorías (miles) y se reparte con los códigos (millones)
+    causa = std["COD_CAUSA"].cat
+    prefixes = pd.Categorical(causa.categories.astype(str).str[:3])
+    cod3 = pd.Series(prefixes.take(causa.codes.to_numpy(), allow_fill=True), index=std.index, name="COD3")
+    keys = [std[c] for c in CUBE_DIMS[:-1]] + [cod3]
+    cube = keys_size(keys)
+
+    # Cubo por causa completa (4 caracteres) y municipio: tabla de causas y filtro CIE-10.
+    # CIE10 es el código ya llevado a entero, calculado sobre las categorías una sola vez
+    causas_cube = keys_size([std["ANIO"], std["COD_DEPTO"], std["COD_MPIO"], std["COD_CAUSA"]])
+    lut = np.append(cie10_encode(causa.categories), -1)
+    causas_cube["CIE10"] = lut[causas_cube["COD_CAUSA"].cat.codes.to_numpy()]
+    return cube, causas_cube
+
+# --------------------------------------------------------------------------------------
+# Versiones del dataset y recarga en caliente
+# --------------------------------------------------------------------------------------
+class DataVersion:
+    """Un dataset cargado (`std`, dims y su cubo), identificado por la huella de sus insumos."""
+
+    def __init__(self, key, std, dims):
+        self.key = key
+        self.std = std
+        self.dims = dims
+        self._cube = None
+        self._derived = {}
+        self._lock = threading.RLock()  # `derived` puede pedir el cubo mientras construye
+
+    def derived(self, name, build):
+        """Artefacto derivado de esta versión (p. ej. el paquete de agregados), calculado una vez."""
+        if name not in self._derived:
+            with self._lock:
+                if name not in self._derived:
+                    self._derived[name] = build()
+        return self._derived[name]
+
+    def cube(self):
+        if self._cube is None:
+            with self._lock:
+                if self._cube is None:
+                    with timed("load", stage="cubo") as st:
+                        cube, causas_cube = build_cube(self.std)
+                        st.rows = len(cube)
+                    self._cube = (cube, causas_cube)
+        return self._cube
+
+    def has_cube(self):
+        return self._cube is not None
+
+class DataStore:
+    """Versión vigente del dataset. `swap` publica otra sin cortar los callbacks en curso."""
+
+    def __init__(self):
+        self._current = None
+        self._retired = None  # weakref a la versión reemplazada mientras alguien la use
+        self._lock = threading.Lock()
+
+    def current(self):
+        version = self._current
+        if version is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = _load_version()
+                version = self._current
+        return version
+
+    def peek(self):
+        """La versión vigente sin cargar nada (None si aún no hay)."""
+        return self._current
+
+    def swap(self, version):
+        with self._lock:
+            old, self._current = self._current, version
+            self._retired = weakref.ref(old) if old is not None else None
+        # Las entradas viejas ya no se pueden servir (la clave incluye la versión): solo liberan espacio
+        PANEL_CACHE.clear()
+
+    def retired_alive(self):
+        return self._retired is not None and self._retired() is not None
+
+DATA = DataStore()
+
+def data_version():
+    """Versión con la que trabaja la petición actual.
+
+    Se fija en el primer acceso dentro de la petición: un callback en curso termina con la
+    versión con la que empezó aunque otra se publique a mitad de camino.
+    """
+    if not has_request_context():
+        return DATA.current()
+    version = g.get("data_version")
+    if version is None:
+        version = g.data_version = DATA.current()
+    return version
+
+def load_data():
+    version = data_version()
+    return version.std, load_geojson(), version.dims
+
+def load_cube():
+    version = data_version()
+    cube, causas_cube = version.cube()
+    return cube, causas_cube, version.dims
+
+def _build_snapshot_out_of_process():
+    """Corre tools/build_snapshot.py; si falla se avisa y `_load_version` lo reintenta aquí (o cae a memoria)."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", "build_snapshot.py")
+    env = dict(os.environ, PRELOAD_DATA="0", DATA_WATCH_SECONDS="0", WARM_START="0")
+    out = subprocess.run([sys.executable, script], env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        tail = out.stderr.strip().splitlines()[-1:] or [f"exit {out.returncode}"]
+        print(f"⚠️ build_snapshot falló: {tail[0]}", flush=True)
+
+def reload_data(wait_s=120):
+    """Construye la versión de los insumos actuales fuera de las peticiones y la publica.
+
+    Como mucho conviven dos versiones: antes de construir se espera a que la reemplazada
+    anteriormente ya no tenga callbacks en curso; si tras `wait_s` sigue viva, no se construye
+    nada y devuelve None (el watcher reintenta en la vuelta siguiente). Con snapshot, el parseo de los Excel corre
+    en un proceso aparte (tools/build_snapshot.py), así el pico de memoria no queda en el worker.
+    """
+    deadline = time.monotonic() + wait_s
+    while DATA.retired_alive() and time.monotonic() < deadline:
+        gc.collect()
+        time.sleep(0.5)
+    if DATA.retired_alive():
+        print("⚠️ La versión anterior de los datos sigue en uso; la recarga se reintenta más tarde.", flush=True)
+        return None
+
+    if not SNAPSHOT_PATH and (USE_SNAPSHOT or PRELOAD_DATA):
+        _build_snapshot_out_of_process()
+    version = _load_version()
+    version.cube()
+    DATA.swap(version)
+    return version
+
+def _watch_data(interval):
+    """Revisa la huella de los insumos cada `interval` s y recarga cuando cambia."""
+    pending = failed = None
+    while True:
+        time.sleep(interval)
+        current = DATA.peek()
+        current_key = current.key if current is not None else None
+        del current  # no retener la versión entre vueltas: la anterior debe poder liberarse
+        try:
+            fingerprint = data_fingerprint()
+        except OSError:
+            continue  # un archivo a medio reemplazar
+        if current_key is None or fingerprint in (current_key, failed):
+            pending = None
+            continue
+        if fingerprint != pending:
+            # Espera a ver la misma huella dos veces seguidas: el archivo puede estar copiándose
+            pending = fingerprint
+            continue
+        try:
+            version = reload_data()
+            if version is None:
+                continue  # `pending` se mantiene: la próxima vuelta reintenta sin esperar otra lectura
+            print(f"Datos recargados: versión {version.key} ({len(version.std):,} registros)", flush=True)
+            del version
+        except Exception as e:
+            failed = fingerprint
+            print(f"⚠️ No se pudo recargar los datos ({fingerprint}): {e}", flush=True)
+        pending = None
 
-    return std, geojson
+_WATCHER_PID = None
+
+def start_data_watcher():
+    """Arranca el watcher en este proceso (una vez por pid: los hilos no sobreviven al fork)."""
+    global _WATCHER_PID
+    if DATA_WATCH_SECONDS <= 0 or SNAPSHOT_PATH or _WATCHER_PID == os.getpid():
+        return
+    _WATCHER_PID = os.getpid()
+    threading.Thread(target=_watch_data, args=(DATA_WATCH_SECONDS,), name="data-watcher", daemon=True).start()
+
+# --------------------------------------------------------------------------------------
+# Cache de paneles (LRU acotado por bytes)
+# --------------------------------------------------------------------------------------
+class PanelCache:
+    """LRU thread-safe cuyo límite es el tamaño JSON de los valores guardados."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        size = len(to_json_plotly(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+PANEL_CACHE = PanelCache(PANEL_CACHE_BYTES)
+
+def panel_cached(name):
+    """Memoiza un panel en PANEL_CACHE por (versión de datos, nombre, *argumentos)."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args):
+            key = (data_version().key, name) + args
+            value = PANEL_CACHE.get(key)
+            if value is None:
+                value = fn(*args)
+                with timed("panel", panel=name, stage="json"):
+                    PANEL_CACHE.put(key, value)
+            return value
+        return wrapper
+    return deco
+
+# --------------------------------------------------------------------------------------
+# Paneles (cada uno depende solo de sus propias entradas)
+# --------------------------------------------------------------------------------------
+AGE_ORDER = [
+    "Mortalidad neonatal", "Mortalidad infantil", "Primera infancia", "Niñez",
+    "Adolescencia", "Juventud", "Adultez temprana", "Adultez intermedia",
+    "Vejez", "Longevidad / Centenarios", "Edad desconocida",
+]
+
+def parse_homicide_codes(raw):
+    """Intervalos CIE-10 del filtro de violencia (usa DEFAULT_HOMICIDE_CODES si viene vacío)."""
+    return parse_cie10(raw or DEFAULT_HOMICIDE_CODES)
+
+def _year_cube(year):
+    cube, _, _ = load_cube()
+    return cube[cube["ANIO"] == int(year)]
+
+def _error_figure(e):
+    import plotly.graph_objects as go
+    return go.Figure().update_layout(title_text=f"Error: {e}").to_dict()
+
+def _geojson_bounds(geojson):
+    """(lon_min, lon_max, lat_min, lat_max) de todas las geometrías."""
+    def coords(c):
+        if c and isinstance(c[0], (int, float)):
+            yield c[:2]
+        else:
+            for sub in c:
+                yield from coords(sub)
+    pts = np.array([p for f in geojson["features"] for p in coords(f["geometry"]["coordinates"])])
+    return pts[:, 0].min(), pts[:, 0].max(), pts[:, 1].min(), pts[:, 1].max()
+
+def _base_choropleth(geojson, key, hovertext, title):
+    """Coroplético sin `z` sobre `geojson` (ubicaciones = properties[key]), ya encuadrado."""
+    import plotly.graph_objects as go
+    locations = [f["properties"][key] for f in geojson["features"]]
+    lon0, lon1, lat0, lat1 = _geojson_bounds(geojson)
+    pad_lon, pad_lat = (lon1 - lon0) * 0.02, (lat1 - lat0) * 0.02
+    fig = go.Figure(go.Choropleth(
+        geojson=geojson, featureidkey=f"properties.{key}", locations=locations,
+        z=[None] * len(locations), hovertext=hovertext or [""] * len(locations),
+        colorscale="Reds", colorbar_title_text="TOTAL",
+        hovertemplate="<b>%{hovertext}</b><br>TOTAL=%{z}<extra></extra>",
+    ))
+    fig.update_geos(visible=False, projection_type="mercator",
+                    lonaxis_range=[lon0 - pad_lon, lon1 + pad_lon],
+                    lataxis_range=[lat0 - pad_lat, lat1 + pad_lat])
+    fig.update_layout(title_text=title, margin={"r": 0, "l": 0, "b": 0})
+    return fig.to_dict()
+
+@lru_cache(maxsize=1)
+def base_map_figure():
+    """Coroplético sin datos: la geometría y el encuadre viajan una sola vez por sesión.
+
+    Las ubicaciones son todos los departamentos del GeoJSON en orden fijo; cada cambio de año
+    solo parcha `z`, `hovertext` y el título (ver `update_mapa`). El encuadre se calcula aquí
+    para que el navegador no recalcule `fitbounds` en cada actualización.
+    """
+    import plotly.graph_objects as go
+    geojson = load_geojson()
+    if geojson is None:
+        return go.Figure().to_dict()
+    return _base_choropleth(geojson, "COD_DEPTO", None, "Total de muertes por departamento")
+
+# Detalle municipal antes del primer clic sobre el mapa
+MPIOS_HINT_FIGURE = {"data": [], "layout": {
+    "title": {"text": "Haz clic en un departamento para ver sus municipios"},
+    "xaxis": {"visible": False}, "yaxis": {"visible": False},
+}}
+
+@lru_cache(maxsize=64)
+def base_mpios_figure(depto):
+    """Coroplético municipal de un departamento (None sin su GeoJSON); como `base_map_figure`,
+    la geometría viaja una vez y los cambios de año solo parchan `z` y el título."""
+    geojson = load_mpios_geojson(depto)
+    if geojson is None:
+        return None
+    names = [f["properties"].get("NOM_MPIO", "") for f in geojson["features"]]
+    return _base_choropleth(geojson, "COD_MPIO", names, "Muertes por municipio")
+
+@panel_cached("mapa")
+def panel_mapa(year):
+    """Mapa por departamento: solo los arreglos que cambian con el año (o barras si falta GeoJSON)."""
+    import plotly.express as px
+    geojson = load_geojson()
+    _, _, dims = load_cube()
+    with timed("panel", panel="mapa", stage="agregacion") as st:
+        cy = _year_cube(year)
+        st.rows = len(cy)
+        tot_depto = rollup(rollup(cy, ["COD_DEPTO"]).merge(dims["depto"], on="COD_DEPTO"), ["COD_DEPTO", "NOM_DEPTO"])
+    if geojson is None:
+        with timed("panel", panel="mapa", stage="figura"):
+            fig_map = px.bar(
+                tot_depto.sort_values("TOTAL", ascending=False),
+                x="NOM_DEPTO", y="TOTAL", custom_data=["COD_DEPTO"],
+                title=f"Total de muertes por departamento — {year} (sin GeoJSON)",
+            )
+            fig_map.update_xaxes(tickangle=45)
+            return {"figure": fig_map.to_dict()}
+
+    with timed("panel", panel="mapa", stage="figura"):
+        locations = base_map_figure()["data"][0]["locations"]
+        by_code = tot_depto.set_index(tot_depto["COD_DEPTO"].astype(int))
+        return {
+            "z": [int(by_code.at[c, "TOTAL"]) if c in by_code.index else None for c in locations],
+            "hovertext": [by_code.at[c, "NOM_DEPTO"] if c in by_code.index else "" for c in locations],
+            "title": f"Total de muertes por departamento — {year}",
+        }
+
+def mpio_totals():
+    """Muertes por municipio agrupadas por (año, departamento); se calcula una vez por versión."""
+    def build():
+        cube, _, dims = load_cube()
+        tot = rollup(cube, ["ANIO", "COD_DEPTO", "COD_MPIO"]).merge(
+            dims["mpio"], on=["COD_DEPTO", "COD_MPIO"], how="left")
+        tot["COD_MPIO"] = tot["COD_MPIO"].astype(int)
+        return {(int(y), int(d)): part[["COD_MPIO", "NOM_MPIO", "TOTAL"]].reset_index(drop=True)
+                for (y, d), part in tot.groupby(["ANIO", "COD_DEPTO"], observed=True)}
+    return data_version().derived("mpio_totals", build)
+
+@panel_cached("mapa_mpios")
+def panel_mapa_mpios(year, depto):
+    """Municipios de un departamento: `z` del año alineado con `base_mpios_figure` (o barras)."""
+    import plotly.express as px
+    _, _, dims = load_cube()
+    nombre = dims["depto"].loc[dims["depto"]["COD_DEPTO"] == depto, "NOM_DEPTO"]
+    title = f"Muertes por municipio — {nombre.iloc[0] if len(nombre) else depto}, {year}"
+    with timed("panel", panel="mapa_mpios", stage="agregacion") as st:
+        tot = mpio_totals().get((year, depto), pd.DataFrame(columns=["COD_MPIO", "NOM_MPIO", "TOTAL"]))
+        st.rows = len(tot)
+    with timed("panel", panel="mapa_mpios", stage="figura"):
+        base = base_mpios_figure(depto)
+        if base is None:
+            fig = px.bar(tot.sort_values("TOTAL", ascending=False), x="NOM_MPIO", y="TOTAL",
+                         title=f"{title} (sin GeoJSON municipal)")
+            fig.update_xaxes(tickangle=45)
+            return {"figure": fig.to_dict()}
+        by_code = dict(zip(tot["COD_MPIO"].tolist(), tot["TOTAL"].tolist()))
+        # Un municipio del GeoJSON sin registros en el año tuvo cero muertes, no un dato faltante
+        return {"z": [int(by_code.get(c, 0)) for c in base["data"][0]["locations"]], "title": title}
+
+@panel_cached("linea")
+def panel_linea(year):
+    """Línea mensual."""
+    import plotly.express as px
+    with timed("panel", panel="linea", stage="agregacion") as st:
+        cy = _year_cube(year)
+        st.rows = len(cy)
+        mens = rollup(cy, ["MES"]).sort_values("MES")
+    with timed("panel", panel="linea", stage="figura"):
+        fig_line = px.line(mens, x="MES", y="TOTAL", markers=True, title=f"Muertes por mes — {year}")
+        fig_line.update_xaxes(dtick=1)
+        return fig_line.to_dict()
+
+@panel_cached("violencia")
+def panel_violencia(year, intervals):
+    """Barras — Top 5 ciudades más violentas para los intervalos CIE-10 `intervals`."""
+    import plotly.express as px
+    _, causas_cube, dims = load_cube()
+    with timed("panel", panel="violencia", stage="agregacion") as st:
+        cy = causas_cube[causas_cube["ANIO"] == int(year)]
+        st.rows = len(cy)
+        cv = cy[cie10_match(cy["CIE10"].to_numpy(), intervals)]
+        violentas = rollup(cv, ["COD_DEPTO", "COD_MPIO"])
+        violentas = violentas.merge(dims["mpio"], on=["COD_DEPTO", "COD_MPIO"], how="left")
+
+        # Agrupar por municipio si hay nombre; si no, por código de municipio; y si tampoco, por dpto
+        if violentas["NOM_MPIO"].notna().any():
+            x_col = "NOM_MPIO"
+            title_scope = "ciudad (municipio)"
+        elif violentas["COD_MPIO"].notna().any():
+            x_col = "COD_MPIO"
+            title_scope = "municipio (código)"
+        else:
+            violentas = rollup(cv, ["COD_DEPTO"]).merge(dims["depto"], on="COD_DEPTO")
+            x_col = "NOM_DEPTO"
+            title_scope = "departamento"
+        top5 = rollup(violentas, [x_col]).sort_values("TOTAL", ascending=False).head(5)
+
+    with timed("panel", panel="violencia", stage="figura"):
+        fig_barras_viol = px.bar(
+            top5, x=x_col, y="TOTAL",
+            title=f"Top 5 {title_scope} por homicidio ({format_cie10(intervals)}) — {year}",
+        )
+        fig_barras_viol.update_layout(xaxis_title=title_scope.capitalize(), yaxis_title="Total")
+        return fig_barras_viol.to_dict()
+
+@panel_cached("pie")
+def panel_pie(year):
+    """Pie — 10 ciudades con menor mortalidad."""
+    import plotly.express as px
+    _, _, dims = load_cube()
+    with timed("panel", panel="pie", stage="agregacion") as st:
+        cy = _year_cube(year)
+        st.rows = len(cy)
+        ciudades = rollup(cy, ["COD_DEPTO", "COD_MPIO"]).merge(dims["mpio"], on=["COD_DEPTO", "COD_MPIO"])
+        bottom10 = rollup(ciudades, ["NOM_MPIO"]).sort_values("TOTAL", ascending=True).head(10)
+    with timed("panel", panel="pie", stage="figura"):
+        fig_pie = px.pie(bottom10, names="NOM_MPIO", values="TOTAL",
+                         title=f"10 ciudades con menor mortalidad — {year}", hole=0.3)
+        return fig_pie.to_dict()
+
+@panel_cached("tabla")
+def panel_tabla(year):
+    """Tabla — Top 10 causas."""
+    _, causas_cube, dims = load_cube()
+    with timed("panel", panel="tabla", stage="agregacion") as st:
+        cy = causas_cube[causas_cube["ANIO"] == int(year)]
+        st.rows = len(cy)
+        causas_y = rollup(cy, ["COD_CAUSA"]).merge(dims["causa"], on="COD_CAUSA")
+        top_causas = (rollup(causas_y, ["COD_CAUSA", "NOMBRE_CAUSA"])
+                      .sort_values("TOTAL", ascending=False)
+                      .head(10))
+    with timed("panel", panel="tabla", stage="figura"):
+        return top_causas.to_dict("records")
+
+@panel_cached("sexo")
+def panel_sexo(year):
+    """Barras apiladas — por sexo y dpto."""
+    import plotly.express as px
+    _, _, dims = load_cube()
+    with timed("panel", panel="sexo", stage="agregacion") as st:
+        cy = _year_cube(year)
+        st.rows = len(cy)
+        sexo_depto = rollup(rollup(cy, ["COD_DEPTO", "SEXO"]).merge(dims["depto"], on="COD_DEPTO"),
+                            ["NOM_DEPTO", "SEXO"])
+    with timed("panel", panel="sexo", stage="figura"):
+        fig_apiladas = px.bar(sexo_depto, x="NOM_DEPTO", y="TOTAL", color="SEXO",
+                              title=f"Muertes por sexo por dpto — {year}")
+        fig_apiladas.update_layout(barmode="stack")
+        fig_apiladas.update_xaxes(tickangle=45)
+        return fig_apiladas.to_dict()
+
+@panel_cached("edad")
+def panel_edad(year):
+    """Distribución por grupo de edad: solo viajan las barras ya contadas, no los registros."""
+    import plotly.express as px
+    with timed("panel", panel="edad", stage="agregacion") as st:
+        cy = _year_cube(year)
+        st.rows = len(cy)
+        edades = cy.groupby("GRUPO_EDAD1", dropna=False)["TOTAL"].sum()
+        totals = edades.groupby(age_labels(edades.index)).sum()
+        labels = AGE_ORDER + (["Desconocido"] if totals.get("Desconocido", 0) else [])
+        hist = totals.reindex(labels, fill_value=0).rename_axis("GRUPO_EDAD_LABEL").reset_index()
+    with timed("panel", panel="edad", stage="figura"):
+        fig_hist = px.bar(hist, x="GRUPO_EDAD_LABEL", y="TOTAL", title="Distribución por grupo de edad")
+        fig_hist.update_xaxes(tickangle=30)
+        fig_hist.update_yaxes(title_text="count")
+        return fig_hist.to_dict()
+
+# --------------------------------------------------------------------------------------
+# Paquete de agregados para el navegador (CLIENTSIDE_PANELS=1)
+# --------------------------------------------------------------------------------------
+# Campos de cada figura que cambian con el año; el resto viaja una sola vez como esqueleto
+BUNDLE_FIELDS = {
+    "linea":     ["data.0.x", "data.0.y", "layout.title.text"],
+    "pie":       ["data.0.labels", "data.0.values", "layout.title.text"],
+    "sexo":      ["data.0.x", "data.0.y", "data.0.marker.color", "layout.title.text"],
+    "edad":      ["data.0.x", "data.0.y"],
+    "violencia": ["data.0.x", "data.0.y", "data.0.hovertemplate", "layout.title.text", "layout.xaxis.title.text"],
+}
+
+def normalize_codes_text(raw):
+    """Forma canónica del texto de códigos que comparan servidor y navegador (mayúsculas, sin espacios)."""
+    return re.sub(r"\s+", "", (raw or "").upper())
+
+def _pop_path(obj, path):
+    *head, last = path.split(".")
+    for k in head:
+        obj = obj[int(k)] if isinstance(obj, list) else obj.get(k, {})
+    return obj.pop(last, None) if isinstance(obj, dict) else None
+
+def _set_path(obj, path, value):
+    *head, last = path.split(".")
+    for k in head:
+        obj = obj[int(k)] if isinstance(obj, list) else obj.setdefault(k, {})
+    obj[last] = value
+
+def build_bundle():
+    """Paquete JSON con lo necesario para armar los paneles de cualquier año en el navegador.
+
+    Cada figura se guarda como un esqueleto (la del primer año sin los campos de BUNDLE_FIELDS)
+    más, por año, solo esos campos: los conteos por mes, departamento, municipio, sexo, edad y
+    el top de violencia con los códigos por defecto. Si la figura de un año no calza con el
+    esqueleto va completa. El template de Plotly viaja una sola vez.
+    """
+    std, _, _ = load_data()
+    years = sorted(std["ANIO"].dropna().unique().astype(int).tolist())
+    default = parse_homicide_codes(None)
+    builders = {
+        "linea": panel_linea, "pie": panel_pie, "sexo": panel_sexo, "edad": panel_edad,
+        "violencia": lambda y: panel_violencia(y, default),
+    }
+    bundle = {"version": data_version().key, "years": years, "template": None,
+              "default_codes": normalize_codes_text(DEFAULT_HOMICIDE_CODES), "panels": {},
+              "mapa": {}, "tabla": {}}
+    for name, build in builders.items():
+        skeleton, per_year = None, {}
+        for y in years:
+            fig = json.loads(to_json_plotly(build(y)))
+            bundle["template"] = fig["layout"].pop("template", bundle["template"])
+            fields = {}
+            for p in BUNDLE_FIELDS[name]:
+                value = _pop_path(fig, p)
+                if value is not None:
+                    fields[p] = value
+            if skeleton is None:
+                skeleton = fig
+            if fig == skeleton:
+                per_year[y] = fields
+            else:
+                for p, v in fields.items():
+                    _set_path(fig, p, v)
+                per_year[y] = {"figure": fig}
+        bundle["panels"][name] = {"skeleton": skeleton, "years": per_year}
+    for y in years:
+        mapa = json.loads(to_json_plotly(panel_mapa(y)))
+        if "figure" in mapa:
+            mapa["figure"]["layout"].pop("template", None)
+        bundle["mapa"][y] = mapa
+        bundle["tabla"][y] = json.loads(to_json_plotly(panel_tabla(y)))
+    return bundle
+
+def bundle_gzip():
+    """El paquete de la versión actual, serializado y comprimido (una vez por versión)."""
+    def build():
+        raw = json.dumps(build_bundle(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return gzip.compress(raw, compresslevel=9)
+    return data_version().derived("bundle", build)
 
 # --------------------------------------------------------------------------------------
 # App
@@ -166,191 +1408,616 @@ def load_data():
 app = Dash(__name__, title="Mortalidad en Colombia 2019", suppress_callback_exceptions=True)
 server = app.server
 
-app.layout = html.Div([
-    html.H1("Mortalidad en Colombia — 2019"),
-    html.Div("Explora patrones demográficos y regionales."),
-    html.Div([
-        html.Label("Filtrar por año"),
-        dcc.Dropdown(id="year-dd", options=[], value=2019, clearable=False),
-        html.Label("Código(s) homicidio (coma-separados o rangos X93-X95)"),
-        dcc.Input(id="homicide-codes", type="text", value="X93,X94,X95,Y09"),
-    ], style={"display": "grid", "gridTemplateColumns": "260px 1fr", "gap": "8px", "maxWidth": "620px"}),
-
-    dcc.Tabs([
-        dcc.Tab(label="Mapa por departamento", children=[dcc.Graph(id="mapa-deptos")]),
-        dcc.Tab(label="Muertes por mes (línea)", children=[dcc.Graph(id="linea-mensual")]),
-        dcc.Tab(label="Top 5 ciudades violentas (barras)", children=[dcc.Graph(id="barras-violencia")]),
-        dcc.Tab(label="10 ciudades con menor mortalidad (circular)", children=[dcc.Graph(id="pie-ciudades-menor")]),
-        dcc.Tab(label="Top 10 causas (tabla)", children=[dash_table.DataTable(
-            id="tabla-causas",
-            columns=[
-                {"name": "Código", "id": "COD_CAUSA"},
-                {"name": "Causa",  "id": "NOMBRE_CAUSA"},
-                {"name": "Total",  "id": "TOTAL"},
-            ],
-            page_size=10,
-            sort_action="native",
-            style_table={"overflowX": "auto"},
-            style_cell={"textAlign": "left", "padding": "6px"},
-            style_header={"fontWeight": "bold"},
-        )]),
-        dcc.Tab(label="Muertes por sexo por dpto (apiladas)", children=[dcc.Graph(id="barras-apiladas-sexo")]),
-        dcc.Tab(label="Distribución por grupo de edad (histograma)", children=[dcc.Graph(id="histograma-edad")]),
-    ]),
-    html.Div(id="status-msg", style={"marginTop": "8px", "color": "#555"}),
-])
+def serve_layout():
+    return html.Div([
+        html.H1("Mortalidad en Colombia — 2019"),
+        html.Div("Explora patrones demográficos y regionales."),
+        html.Div([
+            html.Label("Filtrar por año"),
+            dcc.Dropdown(id="year-dd", options=[], value=None if warming() else 2019, clearable=False),
+            html.Label("Código(s) CIE-10 homicidio (coma-separados, rangos X85-Y09, exclusiones !X94)"),
+            dcc.Input(id="homicide-codes", type="text", value=DEFAULT_HOMICIDE_CODES),
+            html.Label("Buscar causas (código o nombre)"),
+            dcc.Dropdown(id="cause-picker", options=[], value=[], multi=True,
+                         placeholder="p. ej. X95, agresión, disparo…"),
+        ], style={"display": "grid", "gridTemplateColumns": "260px 1fr", "gap": "8px", "maxWidth": "620px"}),
+
+        dcc.Tabs([
+            dcc.Tab(label="Mapa por departamento", children=[html.Div([
+                dcc.Graph(id="mapa-deptos", figure=base_map_figure()),
+                dcc.Graph(id="mapa-mpios", figure=MPIOS_HINT_FIGURE),
+                dcc.Store(id="mapa-mpios-depto"),
+            ], style={"display": "grid", "gridTemplateColumns": "repeat(auto-fit, minmax(420px, 1fr))"})]),
+            dcc.Tab(label="Muertes por mes (línea)", children=[dcc.Graph(id="linea-mensual")]),
+            dcc.Tab(label="Top 5 ciudades violentas (barras)", children=[dcc.Graph(id="barras-violencia")]),
+            dcc.Tab(label="10 ciudades con menor mortalidad (circular)", children=[dcc.Graph(id="pie-ciudades-menor")]),
+            dcc.Tab(label="Top 10 causas (tabla)", children=[dash_table.DataTable(
+                id="tabla-causas",
+                columns=[
+                    {"name": "Código", "id": "COD_CAUSA"},
+                    {"name": "Causa",  "id": "NOMBRE_CAUSA"},
+                    {"name": "Total",  "id": "TOTAL"},
+                ],
+                page_size=10,
+                sort_action="native",
+                style_table={"overflowX": "auto"},
+                style_cell={"textAlign": "left", "padding": "6px"},
+                style_header={"fontWeight": "bold"},
+            )]),
+            dcc.Tab(label="Muertes por sexo por dpto (apiladas)", children=[dcc.Graph(id="barras-apiladas-sexo")]),
+            dcc.Tab(label="Distribución por grupo de edad (histograma)", children=[dcc.Graph(id="histograma-edad")]),
+        ]),
+        html.Div(LOADING_MSG if warming() else None, id="status-msg", style={"marginTop": "8px", "color": "#555"}),
+        # Mientras el hilo de arranque carga, `init_years` se reintenta con este intervalo
+        dcc.Interval(id="boot-poll", interval=500, disabled=not warming()),
+        *(_clientside_stores() if CLIENTSIDE_PANELS else []),
+    ])
+
+def _clientside_stores():
+    # `init_years` llena agg-url cuando hay datos: el layout no espera la versión
+    return [
+        dcc.Store(id="agg-url"),
+        dcc.Store(id="agg-store"),
+        dcc.Store(id="violencia-request"),
+    ]
+
+app.layout = serve_layout
 
 # --------------------------------------------------------------------------------------
 # Callbacks
 # --------------------------------------------------------------------------------------
+def available_years():
+    """Años presentes en los datos y el año por defecto (2019 si está, si no el último)."""
+    df, _, _ = load_data()
+    years = sorted(df["ANIO"].dropna().unique().astype(int).tolist())
+    return years, 2019 if 2019 in years else (years[-1] if years else None)
+
 @app.callback(
     Output("year-dd", "options"),
     Output("year-dd", "value"),
     Output("status-msg", "children"),
+    Output("boot-poll", "disabled"),
+    *([Output("agg-url", "data")] if CLIENTSIDE_PANELS else []),
     Input("year-dd", "value"),
+    Input("boot-poll", "n_intervals"),
 )
-def init_years(_):
+def init_years(current, _):
+    """Opciones de año y estado de carga; con WARM_START no espera al hilo de arranque."""
+    pending = (no_update,) if CLIENTSIDE_PANELS else ()
+    if warming():
+        return (no_update, no_update, LOADING_MSG, False) + pending
+    try:
+        years, default = available_years()
+        version = data_version()
+    except Exception as e:
+        return ([], None, f"⚠️ {e}", True) + pending
+    out = ([{"label": str(y), "value": int(y)} for y in years], current if current in years else default,
+           f"Registros: {len(version.std):,}", True)
+    if CLIENTSIDE_PANELS:
+        # La URL lleva la versión de datos: el navegador puede cachear el paquete sin revalidar
+        out += (app.get_relative_path(f"/_aggregates/{version.key}.json"),)
+    return out
+
+def _panel_callback(output, panel, error_value=None):
+    """Registra un callback que solo depende del año y devuelve `panel(year)`."""
+    @app.callback(output, Input("year-dd", "value"))
+    def _update(year):
+        if year is None:
+            return no_update
+        try:
+            return panel(int(year))
+        except Exception as e:
+            return _error_figure(e) if error_value is None else error_value
+    _update.__name__ = f"update_{panel.__name__}"
+    return _update
+
+def update_mapa(year):
+    """Parcha solo z/hovertext/título sobre el coroplético base que ya tiene el navegador."""
+    if year is None:
+        return no_update
+    patch = Patch()
     try:
-        df, _ = load_data()
-        years = sorted(df["ANIO"].dropna().unique().astype(int).tolist())
-        default = 2019 if 2019 in years else (years[-1] if years else None)
-        return [{"label": str(y), "value": int(y)} for y in years], default, f"Registros: {len(df):,}"
+        data = panel_mapa(int(year))
     except Exception as e:
-        return [], None, f"⚠️ {e}"
+        patch["layout"]["title"]["text"] = f"Error: {e}"
+        return patch
+    if "figure" in data:
+        return data["figure"]
+    patch["data"][0]["z"] = data["z"]
+    patch["data"][0]["hovertext"] = data["hovertext"]
+    patch["layout"]["title"]["text"] = data["title"]
+    return patch
+
+def _clicked_depto(click):
+    """COD_DEPTO del punto clicado: `location` en el coroplético, `customdata` en las barras."""
+    points = (click or {}).get("points") or []
+    if not points:
+        return None
+    code = points[0].get("location", (points[0].get("customdata") or [None])[0])
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
 
 @app.callback(
-    Output("mapa-deptos", "figure"),
-    Output("linea-mensual", "figure"),
-    Output("barras-violencia", "figure"),
-    Output("pie-ciudades-menor", "figure"),
-    Output("tabla-causas", "data"),
-    Output("barras-apiladas-sexo", "figure"),
-    Output("histograma-edad", "figure"),
+    Output("mapa-mpios", "figure"),
+    Output("mapa-mpios-depto", "data"),
     Input("year-dd", "value"),
-    Input("homicide-codes", "value"),
+    Input("mapa-deptos", "clickData"),
+    State("mapa-mpios-depto", "data"),
 )
-def update_figures(year, homicide_codes):
+def update_mapa_mpios(year, click, shown):
+    """Detalle municipal del departamento clicado.
+
+    La geometría (solo la de ese departamento) viaja al cambiar de departamento; con el mismo
+    departamento en pantalla, un cambio de año parcha `z` y el título como `update_mapa`.
+    """
+    depto = _clicked_depto(click)
+    if year is None or depto is None:
+        return no_update, no_update
     try:
-        df, geojson = load_data()
+        data = panel_mapa_mpios(int(year), depto)
     except Exception as e:
-        blank = go.Figure().update_layout(title_text=f"Error: {e}")
-        return blank, blank, blank, blank, [], blank, blank
+        return _error_figure(e), None
+    if "figure" in data:
+        return data["figure"], None
+    if depto == shown:
+        patch = Patch()
+        patch["data"][0]["z"] = data["z"]
+        patch["layout"]["title"]["text"] = data["title"]
+        return patch, no_update
+    base = base_mpios_figure(depto)
+    fig = {**base, "data": [{**base["data"][0], "z": data["z"]}, *base["data"][1:]],
+           "layout": {**base["layout"], "title": {**base["layout"]["title"], "text": data["title"]}}}
+    return fig, depto
+
+def _cause_option(item):
+    count = "" if item["count"] is None else f" · {item['count']:,} muertes"
+    return {"label": f"{item['code']} — {item['name']}{count}", "value": item["code"]}
+
+@app.callback(
+    Output("cause-picker", "options"),
+    Input("cause-picker", "search_value"),
+    State("cause-picker", "value"),
+    State("year-dd", "value"),
+)
+def suggest_causes(search_value, selected, year):
+    """Opciones del buscador: lo ya elegido más las sugerencias del índice para el año actual."""
+    if not search_value and not selected:
+        return []
+    index = cause_index()
+    counts = cause_counts(year) if year is not None else None
+    items = [index.describe(code, counts) for code in (selected or [])]
+    chosen = {item["code"] for item in items}
+    items += [item for item in index.search(search_value or "", counts) if item["code"] not in chosen]
+    return [_cause_option(item) for item in items]
+
+@app.callback(Output("homicide-codes", "value"), Input("cause-picker", "value"), prevent_initial_call=True)
+def pick_causes(selected):
+    """Las causas elegidas reemplazan los códigos del panel de violencia (vacío = por defecto)."""
+    return ",".join(selected) if selected else DEFAULT_HOMICIDE_CODES
 
+def update_violencia(year, homicide_codes):
     if year is None:
         return no_update
-    dff = df[df["ANIO"] == int(year)].copy()
+    try:
+        return panel_violencia(int(year), parse_homicide_codes(homicide_codes))
+    except Exception as e:
+        return _error_figure(e)
 
-    # ----------------- 1) Mapa por departamento (o barras si falta GeoJSON) -----------------
-    tot_depto = dff.groupby(["COD_DEPTO", "NOM_DEPTO"], as_index=False).size().rename(columns={"size": "TOTAL"})
-    if geojson is None:
-        fig_map = px.bar(
-            tot_depto.sort_values("TOTAL", ascending=False),
-            x="NOM_DEPTO", y="TOTAL",
-            title=f"Total de muertes por departamento — {year} (sin GeoJSON)",
-        )
-        fig_map.update_xaxes(tickangle=45)
-    else:
-        fig_map = px.choropleth(
-            tot_depto, geojson=geojson, locations="COD_DEPTO",
-            featureidkey="properties.COD_DEPTO", color="TOTAL",
-            hover_name="NOM_DEPTO", color_continuous_scale="Reds",
-        )
-        fig_map.update_geos(fitbounds="locations", visible=False)
-        fig_map.update_layout(title=f"Total de muertes por departamento — {year}")
-
-    # ----------------- 2) Línea mensual -----------------
-    mens = dff.groupby("MES", as_index=False).size().rename(columns={"size": "TOTAL"}).sort_values("MES")
-    fig_line = px.line(mens, x="MES", y="TOTAL", markers=True, title=f"Muertes por mes — {year}")
-    fig_line.update_xaxes(dtick=1)
-
-    # ----------------- 3) Barras — Top 5 ciudades más violentas (homicidios) -----------------
-    # Acepta lista separada por comas y rangos tipo X93-X95; matchea por prefijo de 3 caracteres
-    raw_codes = (homicide_codes or "X93,X94,X95,Y09").upper()
-    tokens = [t.strip() for t in raw_codes.split(",") if t.strip()]
-
-    def expand_token(tok: str):
-        """Expande rangos tipo 'X93-X95' a ['X93','X94','X95']; caso contrario devuelve [tok]."""
-        if "-" in tok and len(tok) == 7:  # p.ej. "X93-X95"
-            a, b = tok.split("-")
-            if len(a) == 3 and len(b) == 3 and a[0] == b[0]:
-                a3, b3 = int(a[1:]), int(b[1:])
-                step = 1 if a3 <= b3 else -1
-                return [f"{a[0]}{i:02d}" for i in range(a3, b3 + step, step)]
-        return [tok]
-
-    codes3 = []
-    for t in tokens:
-        codes3.extend(expand_token(t))
-    codes3 = [c[:3] for c in codes3]  # trabajamos con prefijo de 3 chars (p.ej. X95)
-
-    # Prefijo de 3 chars de COD_CAUSA para capturar X950, X951, etc.
-    dff["__COD3"] = dff["COD_CAUSA"].astype(str).str.upper().str.strip().str[:3]
-    violentas = dff[dff["__COD3"].isin(codes3)]
-
-    # Agrupar por municipio si hay nombre; si no, por código de municipio; y si tampoco, por dpto
-    if "NOM_MPIO" in violentas.columns and violentas["NOM_MPIO"].notna().any():
-        top5 = (violentas.groupby(["NOM_MPIO"], as_index=False).size()
-                .rename(columns={"size": "TOTAL"})
-                .sort_values("TOTAL", ascending=False)
-                .head(5))
-        x_col = "NOM_MPIO"
-        title_scope = "ciudad (municipio)"
-    elif "COD_MPIO" in violentas.columns and violentas["COD_MPIO"].notna().any():
-        top5 = (violentas.groupby(["COD_MPIO"], as_index=False).size()
-                .rename(columns={"size": "TOTAL"})
-                .sort_values("TOTAL", ascending=False)
-                .head(5))
-        x_col = "COD_MPIO"
-        title_scope = "municipio (código)"
-    else:
-        top5 = (violentas.groupby(["NOM_DEPTO"], as_index=False).size()
-                .rename(columns={"size": "TOTAL"})
-                .sort_values("TOTAL", ascending=False)
-                .head(5))
-        x_col = "NOM_DEPTO"
-        title_scope = "departamento"
-
-    fig_barras_viol = px.bar(
-        top5, x=x_col, y="TOTAL",
-        title=f"Top 5 {title_scope} por homicidio ({', '.join(codes3)}) — {year}",
+if CLIENTSIDE_PANELS:
+    # El año se resuelve en el navegador (assets/clientside.js) con el paquete de /_aggregates.
+    # Solo los códigos de violencia distintos a los por defecto vuelven al servidor
+    app.clientside_callback(
+        ClientsideFunction("mortalidad", "loadBundle"),
+        Output("agg-store", "data"),
+        Input("agg-url", "data"),
     )
-    fig_barras_viol.update_layout(xaxis_title=title_scope.capitalize(), yaxis_title="Total")
-
-    # ----------------- 4) Pie — 10 ciudades con menor mortalidad -----------------
-    ciudad_tot = dff.groupby(["NOM_MPIO"], as_index=False).size().rename(columns={"size": "TOTAL"})
-    bottom10 = ciudad_tot.sort_values("TOTAL", ascending=True).head(10)
-    fig_pie = px.pie(bottom10, names="NOM_MPIO", values="TOTAL",
-                     title=f"10 ciudades con menor mortalidad — {year}", hole=0.3)
-
-    # ----------------- 5) Tabla — Top 10 causas -----------------
-    top_causas = (dff.groupby(["COD_CAUSA", "NOMBRE_CAUSA"], as_index=False).size()
-                  .rename(columns={"size": "TOTAL"})
-                  .sort_values("TOTAL", ascending=False)
-                  .head(10))
-    tabla_data = top_causas.to_dict("records")
-
-    # ----------------- 6) Barras apiladas — por sexo y dpto -----------------
-    sexo_depto = dff.groupby(["NOM_DEPTO", "SEXO"], as_index=False).size().rename(columns={"size": "TOTAL"})
-    fig_apiladas = px.bar(sexo_depto, x="NOM_DEPTO", y="TOTAL", color="SEXO",
-                          title=f"Muertes por sexo por dpto — {year}")
-    fig_apiladas.update_layout(barmode="stack")
-    fig_apiladas.update_xaxes(tickangle=45)
-
-    # ----------------- 7) Histograma — grupo de edad -----------------
-    dff["GRUPO_EDAD_LABEL"] = dff["GRUPO_EDAD1"].apply(map_age)
-    order = [
-        "Mortalidad neonatal", "Mortalidad infantil", "Primera infancia", "Niñez",
-        "Adolescencia", "Juventud", "Adultez temprana", "Adultez intermedia",
-        "Vejez", "Longevidad / Centenarios", "Edad desconocida",
-    ]
-    fig_hist = px.histogram(
-        dff, x="GRUPO_EDAD_LABEL",
-        category_orders={"GRUPO_EDAD_LABEL": order},
-        title="Distribución por grupo de edad",
+    app.clientside_callback(
+        ClientsideFunction("mortalidad", "panels"),
+        Output("linea-mensual", "figure"),
+        Output("pie-ciudades-menor", "figure"),
+        Output("tabla-causas", "data"),
+        Output("barras-apiladas-sexo", "figure"),
+        Output("histograma-edad", "figure"),
+        Input("year-dd", "value"),
+        Input("agg-store", "data"),
+    )
+    app.clientside_callback(
+        ClientsideFunction("mortalidad", "mapa"),
+        Output("mapa-deptos", "figure"),
+        Input("year-dd", "value"),
+        Input("agg-store", "data"),
+        State("mapa-deptos", "figure"),
+    )
+    app.clientside_callback(
+        ClientsideFunction("mortalidad", "violencia"),
+        Output("barras-violencia", "figure"),
+        Output("violencia-request", "data"),
+        Input("year-dd", "value"),
+        Input("homicide-codes", "value"),
+        Input("agg-store", "data"),
     )
-    fig_hist.update_xaxes(tickangle=30)
 
-    return fig_map, fig_line, fig_barras_viol, fig_pie, tabla_data, fig_apiladas, fig_hist
+    @app.callback(
+        Output("barras-violencia", "figure", allow_duplicate=True),
+        Input("violencia-request", "data"),
+        prevent_initial_call=True,
+    )
+    def update_violencia_request(req):
+        if not req:
+            return no_update
+        return update_violencia(req.get("year"), req.get("codes"))
+else:
+    update_linea = _panel_callback(Output("linea-mensual", "figure"), panel_linea)
+    update_pie   = _panel_callback(Output("pie-ciudades-menor", "figure"), panel_pie)
+    update_tabla = _panel_callback(Output("tabla-causas", "data"), panel_tabla, error_value=[])
+    update_sexo  = _panel_callback(Output("barras-apiladas-sexo", "figure"), panel_sexo)
+    update_edad  = _panel_callback(Output("histograma-edad", "figure"), panel_edad)
+    app.callback(Output("mapa-deptos", "figure"), Input("year-dd", "value"))(update_mapa)
+    app.callback(
+        Output("barras-violencia", "figure"),
+        Input("year-dd", "value"),
+        Input("homicide-codes", "value"),
+    )(update_violencia)
+
+# --------------------------------------------------------------------------------------
+# API de conteos (solo lectura)
+# --------------------------------------------------------------------------------------
+# Dimensiones del API -> columnas de `std` y de los cubos (causa3 = prefijo de 3 caracteres;
+# mpio se expone como el código DANE de 5 dígitos, ver `_counts_frame`)
+API_DIMS = {
+    "anio": "ANIO", "mes": "MES", "depto": "COD_DEPTO", "mpio": "COD_MPIO",
+    "sexo": "SEXO", "edad": "GRUPO_EDAD1", "causa3": "COD3", "causa": "COD_CAUSA",
+}
+API_DEFAULT_LIMIT = 10_000
+API_MAX_LIMIT = 100_000
+API_CHUNK_ROWS = 5_000
+
+def _isin(column, values):
+    """Máscara de `column` en `values`; si la columna quedó como texto (libros con tipos mezclados), compara como texto."""
+    if isinstance(column.dtype, pd.CategoricalDtype) and column.cat.categories.dtype == object:
+        values = [str(v) for v in values]
+    return column.isin(values).to_numpy(dtype=bool)
+
+def _filter_values(col, raw):
+    values = [v.strip() for v in raw.split(",") if v.strip()]
+    if col in ("COD3", "COD_CAUSA"):
+        return [v.upper() for v in values]
+    return [int(v) if re.fullmatch(r"-?\d+", v) else v for v in values]
+
+def query_counts(by, filters=None, intervals=None):
+    """Conteos agrupados por las columnas `by` sobre la versión de datos vigente.
+
+    `filters` es {columna: valores}; `intervals`, un conjunto CIE-10 de `parse_cie10` (None = todas
+    las causas). Usa el cubo más chico que cubra las columnas pedidas y solo baja a `std` (ya en
+    memoria, sin copiarlo entero) cuando hace falta una combinación que ningún cubo guarda.
+    """
+    filters = filters or {}
+    cols = set(by) | set(filters)
+    cube, causas_cube, _ = load_cube()
+    if intervals is None and cols <= set(CUBE_DIMS):
+        src = cube
+    elif cols <= {"ANIO", "COD_DEPTO", "COD_MPIO", "COD_CAUSA"}:
+        src = causas_cube
+    else:
+        src = None
+
+    if src is not None:
+        mask = np.ones(len(src), dtype=bool)
+        for col, values in filters.items():
+            mask &= _isin(src[col], values)
+        if intervals is not None:
+            mask &= cie10_match(src["CIE10"].to_numpy(), intervals)
+        sub = src[mask]
+        if not by:
+            return pd.DataFrame({"TOTAL": [int(sub["TOTAL"].sum())]})
+        return rollup(sub, list(by))
+
+    # Nivel registro: solo las columnas y filas que pasan los filtros
+    std = data_version().std
+    causa = std["COD_CAUSA"].cat
+    mask = np.ones(len(std), dtype=bool)
+    if intervals is not None:
+        lut = data_version().derived("cie10_lut", lambda: np.append(cie10_encode(causa.categories), -1))
+        mask &= cie10_match(lut[causa.codes.to_numpy()], intervals)
+
+    def column(col):
+        if col == "COD3":
+            def cod3():
+                prefixes = pd.Categorical(causa.categories.astype(str).str[:3])
+                return pd.Series(prefixes.take(causa.codes.to_numpy(), allow_fill=True), name="COD3")
+            return data_version().derived("cod3", cod3)
+        return std[col]
+
+    for col, values in filters.items():
+        mask &= _isin(column(col), values)
+    if not by:
+        return pd.DataFrame({"TOTAL": [int(mask.sum())]})
+    keys = [column(col)[mask].reset_index(drop=True) for col in by]
+    return rollup(keys_size(keys), list(by))
+
+def _dane(depto, mpio):
+    """Código DANE de 5 dígitos (depto * 1000 + municipio): COD_MPIO solo es único dentro del depto."""
+    return depto.astype("Int64") * 1000 + mpio.astype("Int64")
+
+def _counts_frame(by, filters, intervals, names):
+    """Resultado del API: columnas con nombres del API, nombres opcionales y orden estable.
+
+    `mpio` es el código DANE de 5 dígitos, al agrupar y al filtrar: por dentro siempre se
+    agrupa por (COD_DEPTO, COD_MPIO) y el filtro se aplica sobre el par.
+    """
+    cols = [API_DIMS[d] for d in by]
+    query = {API_DIMS[d]: v for d, v in filters.items() if d != "mpio"}
+    dane = filters.get("mpio")
+    extra = []
+    if dane is not None or "COD_MPIO" in cols:
+        extra = [c for c in ("COD_DEPTO", "COD_MPIO") if c not in cols]
+    if dane is not None:
+        query["COD_MPIO"] = sorted({int(c) % 1000 for c in dane if isinstance(c, int)})
+        if "COD_DEPTO" not in query:
+            query["COD_DEPTO"] = sorted({int(c) // 1000 for c in dane if isinstance(c, int)})
+    out = query_counts(cols + extra, query, intervals)
+    if dane is not None:
+        out = out[_dane(out["COD_DEPTO"], out["COD_MPIO"]).isin(dane).to_numpy(dtype=bool)]
+    if extra and "COD_MPIO" not in cols:
+        # El filtro por municipio pidió columnas que no están en `by`: se vuelven a sumar
+        out = rollup(out, cols) if cols else pd.DataFrame({"TOTAL": [int(out["TOTAL"].sum())]})
+    if names:
+        dims = data_version().dims
+        if "COD_DEPTO" in cols:
+            out = out.merge(dims["depto"], on="COD_DEPTO", how="left")
+        if "COD_MPIO" in cols:
+            out = out.merge(dims["mpio"][["COD_DEPTO", "COD_MPIO", "NOM_MPIO"]], on=["COD_DEPTO", "COD_MPIO"], how="left")
+        if "COD_CAUSA" in cols:
+            out = out.merge(dims["causa"], on="COD_CAUSA", how="left")
+    if "COD_MPIO" in cols:
+        out["COD_MPIO"] = _dane(out["COD_DEPTO"], out["COD_MPIO"])
+        out = out.drop(columns=[c for c in extra if c == "COD_DEPTO"])
+    if cols:
+        out = out.sort_values(cols, kind="stable", na_position="last")
+    rename = {API_DIMS[d]: d for d in by}
+    rename.update(NOM_DEPTO="nom_depto", NOM_MPIO="nom_mpio", NOMBRE_CAUSA="nombre_causa", TOTAL="total")
+    out = out.rename(columns=rename)
+    return out[[c for c in out.columns if c != "total"] + ["total"]].reset_index(drop=True)
+
+def _stream_rows(frame, fmt):
+    """Filas de `frame` en bloques CSV/NDJSON (el encabezado CSV va solo en el primero)."""
+    for start in range(0, max(len(frame), 1), API_CHUNK_ROWS):
+        chunk = frame.iloc[start:start + API_CHUNK_ROWS]
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=start == 0).encode("utf-8")
+        elif len(chunk):
+            yield chunk.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n").encode("utf-8") + b"\n"
+
+def _gzip_stream(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+@server.route("/api/v1/counts")
+def api_counts():
+    """Conteos agrupados en CSV o NDJSON, en streaming, paginados y con ETag.
+
+    Parámetros: `by` (dimensiones de API_DIMS separadas por coma), un filtro por dimensión
+    (`anio=2018,2019`, `causa3=X95`, `mpio=5001` con el código DANE de 5 dígitos), `codes` (conjunto CIE-10 como en el filtro de violencia),
+    `format` (csv | ndjson), `limit`/`offset` y `names=1` para agregar los nombres.
+    """
+    args = request.args
+    by = [d.strip() for d in args.get("by", "").split(",") if d.strip()]
+    unknown = [d for d in by if d not in API_DIMS]
+    if unknown or len(set(by)) != len(by):
+        return {"error": f"Dimensiones inválidas o repetidas: {', '.join(unknown) or args['by']}",
+                "dimensions": list(API_DIMS)}, 400
+    fmt = args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return {"error": "format debe ser csv o ndjson"}, 400
+    try:
+        limit = min(int(args.get("limit", API_DEFAULT_LIMIT)), API_MAX_LIMIT)
+        offset = max(int(args.get("offset", 0)), 0)
+    except ValueError:
+        return {"error": "limit y offset deben ser enteros"}, 400
+    if limit < 1:
+        return {"error": "limit debe ser al menos 1"}, 400
+    filters = {d: _filter_values(API_DIMS[d], args[d]) for d in API_DIMS if args.get(d)}
+    intervals = parse_cie10(args["codes"]) if args.get("codes") else None
+    names = args.get("names") == "1"
+
+    # La huella depende solo de la versión de datos, de la consulta normalizada y de la
+    # codificación: el cuerpo gzip y el plano son representaciones distintas
+    version = data_version()
+    encoding = "gzip" if "gzip" in request.headers.get("Accept-Encoding", "") else "identity"
+    canonical = json.dumps([by, sorted(filters.items()), intervals, names, fmt, limit, offset, encoding])
+    etag = hashlib.sha1(f"{version.key}|{canonical}".encode("utf-8")).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    frame = _counts_frame(by, filters, intervals, names)
+    total = len(frame)
+    page = frame.iloc[offset:offset + limit]
+    body = _stream_rows(page, fmt)
+    headers = {"X-Total-Count": str(total), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if offset + limit < total:
+        nxt = request.args.to_dict()
+        nxt.update(offset=str(offset + limit), limit=str(limit))
+        headers["Link"] = f'<{request.base_url}?{urlencode(nxt)}>; rel="next"'
+    if encoding == "gzip":
+        body = _gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = Response(body, mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    return response
+
+# --------------------------------------------------------------------------------------
+# Precarga, readiness y métricas
+# --------------------------------------------------------------------------------------
+def is_ready():
+    """True cuando el dataset y el cubo ya están cargados en este proceso."""
+    version = DATA.peek()
+    return version is not None and version.has_cube()
+
+def _load_all():
+    load_data()
+    load_cube()
+    mpio_totals()
+    if CLIENTSIDE_PANELS:
+        bundle_gzip()
+
+def preload():
+    """Carga datos y cubo en el proceso actual; con preload_app, antes del fork de los workers.
+
+    Con WARM_START el precalentamiento completo corre aquí mismo, sin hilo: un hilo vivo al
+    hacer fork puede dejar tomado un lock (p. ej. el de import) en los workers.
+    """
+    if not SNAPSHOT_PATH:
+        _build_snapshot_out_of_process()  # con varios libros usa el pool, que aquí (en el import) no se puede
+    if WARM_START:
+        warm_caches()
+        return
+    try:
+        _load_all()
+    except Exception as e:
+        print(f"⚠️ No se pudieron precargar los datos: {e}", flush=True)
+
+LOADING_MSG = "⏳ Cargando datos…"
+WARMUP_DONE = threading.Event()
+_WARMUP_PID = None
+
+def warming():
+    """True mientras el hilo de arranque (WARM_START) no termina: el layout muestra LOADING_MSG."""
+    return WARM_START and not WARMUP_DONE.is_set()
+
+def warm_caches():
+    """Lo que pide la primera visita: mapa base, datos, cubo y los paneles del año por defecto.
+
+    Si algo falla solo se avisa: `init_years` vuelve a intentar la carga (y muestra el error).
+    """
+    try:
+        base_map_figure()
+        _load_all()
+        _, year = available_years()
+        if year is not None:
+            with timed("load", stage="paneles"):
+                for panel in (panel_mapa, panel_linea, panel_pie, panel_tabla, panel_sexo, panel_edad):
+                    panel(year)
+                panel_violencia(year, parse_homicide_codes(DEFAULT_HOMICIDE_CODES))
+    except Exception as e:
+        print(f"⚠️ No se pudieron precalentar los datos: {e}", flush=True)
+    finally:
+        WARMUP_DONE.set()
+
+def start_warmup():
+    """Arranca el hilo de arranque en este proceso (una vez por pid, como el watcher).
+
+    Con PRELOAD_DATA no hace nada: el master va a hacer fork y ya precalentó en `preload`.
+    """
+    global _WARMUP_PID
+    if not WARM_START or PRELOAD_DATA or _WARMUP_PID == os.getpid():
+        return
+    _WARMUP_PID = os.getpid()
+    threading.Thread(target=warm_caches, name="warmup", daemon=True).start()
+
+@server.route("/readyz")
+def readyz():
+    if not is_ready():
+        return {"status": "loading"}, 503
+    version = DATA.peek()
+    return {"status": "ready", "rows": len(version.std), "version": version.key}, 200
+
+# Métricas y perfilado por callback: solo las peticiones de Dash a /_dash-update-component
+_PROFILE_LOCK = threading.Lock()  # cProfile no admite dos perfiles activos a la vez
+
+def _is_callback_request():
+    return request.path.endswith("/_dash-update-component")
+
+@server.before_request
+def _ensure_data_watcher():
+    start_data_watcher()
+
+@server.before_request
+def _ensure_warmup():
+    start_warmup()  # red de seguridad si el import fue en otro proceso; con PRELOAD_DATA no arranca nada
+
+@server.before_request
+def _start_callback_timer():
+    if not (METRICS_ENABLED or PROFILE_DIR) or not _is_callback_request():
+        return
+    g.callback_t0 = time.perf_counter()
+    if PROFILE_DIR and random.random() < PROFILE_SAMPLE and _PROFILE_LOCK.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@server.after_request
+def _record_callback(response):
+    t0 = g.pop("callback_t0", None)
+    if t0 is None:
+        return response
+    elapsed = time.perf_counter() - t0
+    body = request.get_json(silent=True) or {}
+    output = body.get("output")
+    if not isinstance(output, str) or output not in app.callback_map:
+        output = "other"  # la etiqueta viene del cliente: solo callbacks registrados, series acotadas
+    if METRICS_ENABLED:
+        size = response.content_length
+        if size is None and not response.direct_passthrough:
+            size = len(response.get_data())
+        METRICS.observe("mortalidad_callback_seconds", elapsed, output=output)
+        if size is not None:
+            METRICS.observe("mortalidad_callback_response_bytes", size, output=output)
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _PROFILE_LOCK.release()
+        if elapsed * 1000 >= PROFILE_SLOW_MS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = re.sub(r"[^\w.-]+", "_", output)[:80]
+            profiler.dump_stats(os.path.join(
+                PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{name}-{elapsed * 1000:.0f}ms.prof"))
+    return response
+
+@server.teardown_request
+def _stop_profiler(_exc):
+    # Si el callback terminó en excepción after_request no corre: suelta el perfil igual
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _PROFILE_LOCK.release()
+
+@server.route("/_aggregates/<key>.json")
+def aggregates(key):
+    """Paquete de agregados gzip; inmutable por versión (otra versión redirige a la vigente)."""
+    if not CLIENTSIDE_PANELS:
+        return {"status": "disabled", "hint": "CLIENTSIDE_PANELS=1"}, 404
+    version = data_version()
+    if key != version.key:
+        return Response(status=302, headers={"Location": app.get_relative_path(f"/_aggregates/{version.key}.json")})
+    body = bundle_gzip()
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{version.key}"', "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(body, mimetype="application/json", headers=headers)
+
+@server.route("/metrics")
+def metrics():
+    if not METRICS_ENABLED:
+        return {"status": "disabled", "hint": "METRICS_ENABLED=1"}, 404
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+_IN_POOL = multiprocessing.parent_process() is not None  # procesos del pool de ingesta: no cargan nada
+_IMPORTED = False
+if PRELOAD_DATA and not _IN_POOL:
+    preload()
+_IMPORTED = True  # desde aquí read_mortality ya puede repartir los libros en el pool
+if not _IN_POOL:
+    start_warmup()
 
 # --------------------------------------------------------------------------------------
 # Main
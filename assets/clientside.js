@@ -0,0 +1,111 @@
+// assets/clientside.js
+// Paneles armados en el navegador (CLIENTSIDE_PANELS=1) a partir del paquete de /_aggregates:
+// cambiar de año no hace ninguna petición al servidor.
+(function () {
+    var ns = (window.dash_clientside = window.dash_clientside || {});
+
+    function noUpdate() {
+        return window.dash_clientside.no_update;
+    }
+
+    function clone(obj) {
+        return JSON.parse(JSON.stringify(obj));
+    }
+
+    function setPath(obj, path, value) {
+        var keys = path.split(".");
+        for (var i = 0; i < keys.length - 1; i++) {
+            if (obj[keys[i]] === undefined) {
+                obj[keys[i]] = {};
+            }
+            obj = obj[keys[i]];
+        }
+        obj[keys[keys.length - 1]] = value;
+    }
+
+    // Esqueleto del panel + campos del año (o la figura completa si no calzaba con el esqueleto)
+    function figure(bundle, name, year) {
+        var panel = bundle.panels[name];
+        var entry = panel && panel.years[year];
+        if (!entry) {
+            return null;
+        }
+        var fig;
+        if (entry.figure) {
+            fig = clone(entry.figure);
+        } else {
+            fig = clone(panel.skeleton);
+            Object.keys(entry).forEach(function (path) {
+                setPath(fig, path, entry[path]);
+            });
+        }
+        fig.layout = fig.layout || {};
+        fig.layout.template = bundle.template;
+        return fig;
+    }
+
+    function normalizeCodes(raw) {
+        return (raw || "").toUpperCase().replace(/\s+/g, "");
+    }
+
+    ns.mortalidad = {
+        loadBundle: function (url) {
+            if (!url) {
+                return noUpdate();
+            }
+            return fetch(url).then(function (resp) {
+                if (!resp.ok) {
+                    throw new Error("No se pudo cargar " + url + ": HTTP " + resp.status);
+                }
+                return resp.json();
+            });
+        },
+
+        panels: function (year, bundle) {
+            var names = ["linea", "pie", "tabla", "sexo", "edad"];
+            if (year === null || year === undefined || !bundle) {
+                return names.map(noUpdate);
+            }
+            return names.map(function (name) {
+                var out = name === "tabla" ? bundle.tabla[year] : figure(bundle, name, year);
+                return out === undefined || out === null ? noUpdate() : out;
+            });
+        },
+
+        mapa: function (year, bundle, current) {
+            var m = bundle && bundle.mapa[year];
+            if (year === null || year === undefined || !m) {
+                return noUpdate();
+            }
+            if (m.figure) {
+                var full = clone(m.figure);
+                full.layout.template = bundle.template;
+                return full;
+            }
+            // Mismo cambio que hace el Patch del servidor: solo z, hovertext y título
+            if (!current || !current.data || !current.data.length) {
+                return noUpdate();
+            }
+            var fig = Object.assign({}, current);
+            fig.data = current.data.slice();
+            fig.data[0] = Object.assign({}, current.data[0], {z: m.z, hovertext: m.hovertext});
+            fig.layout = Object.assign({}, current.layout);
+            fig.layout.title = Object.assign({}, current.layout.title, {text: m.title});
+            return fig;
+        },
+
+        // Devuelve [figura, pedido al servidor]: con los códigos por defecto la figura sale del
+        // paquete; con cualquier otro conjunto se delega al callback del servidor
+        violencia: function (year, codes, bundle) {
+            if (year === null || year === undefined) {
+                return [noUpdate(), noUpdate()];
+            }
+            var norm = normalizeCodes(codes);
+            if (norm === "" || (bundle && norm === bundle.default_codes)) {
+                var fig = bundle && figure(bundle, "violencia", year);
+                return fig ? [fig, noUpdate()] : [noUpdate(), noUpdate()];
+            }
+            return [noUpdate(), {year: year, codes: codes}];
+        },
+    };
+})();
@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+import gc, os
+
+# PRELOAD_DATA=1: el master importa app.py (y carga los datos) antes del fork; los workers
+# heredan el dataset ya cargado en lugar de parsear los Excel cada uno
+preload_app = os.environ.get("PRELOAD_DATA", "0") == "1"
+
+def when_ready(server):
+    if preload_app:
+        # Congela los objetos ya cargados para que el GC de los workers no los toque y
+        # sus páginas sigan compartidas (copy-on-write)
+        gc.freeze()
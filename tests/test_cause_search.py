@@ -0,0 +1,45 @@
+# tests/test_cause_search.py
+import os, sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+
+@pytest.fixture(scope="module")
+def index():
+    causas = pd.read_csv(os.path.join(ROOT, "data", "CodigosDeMuerte.cleaned.csv"), dtype=str)
+    return app.CauseIndex(causas["COD_CAUSA"].tolist(), causas["NOMBRE_CAUSA"].tolist())
+
+def _codes(index, query):
+    return [s["code"] for s in index.search(query, limit=100)]
+
+@pytest.mark.parametrize("query, same_as", [
+    ("fiebre y", "fiebre"),
+    ("agresion a", "agresion"),
+    ("agresión, disparo", "agresion disparo"),
+    ("agresion-disparo", "agresion disparo"),
+])
+def test_puntuacion_y_palabras_cortas(index, query, same_as):
+    expected = _codes(index, same_as)
+    assert expected
+    assert _codes(index, query) == expected
+
+def test_solo_palabras_cortas(index):
+    # "y" sola es un prefijo de código (capítulo Y); con espacio ya es texto
+    assert index.search("a y") == []
+    assert index.search(", -") == []
+
+def test_busqueda_por_codigo(index):
+    codes = _codes(index, "x95")
+    assert codes[0] == "X95" and all(c.startswith("X95") for c in codes)
+
+def test_todo_codigo_del_catalogo_es_un_filtro_valido(index):
+    # El selector escribe los códigos tal cual en homicide-codes
+    invalid = [c for c in index.codes if not app.parse_cie10(c)]
+    assert invalid == []
+    assert _codes(index, "hipertension esencial")[0] == "I10X"
+    assert app.parse_cie10("I10X")
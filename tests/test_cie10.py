@@ -0,0 +1,43 @@
+# tests/test_cie10.py
+import os, sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+from tools.synth_eevv import generate
+
+DATA = os.path.join(ROOT, "data")
+
+def test_codigo_con_x_es_el_codigo_de_3_caracteres():
+    i10, i10x, i100 = app.cie10_encode(["I10", "I10X", "I100"])
+    assert i10 == i10x and i100 == i10 + 1
+    assert app.parse_cie10("I10X") == ((i10, i10),)
+    assert app.parse_cie10("I10") == ((i10, i10 + 10),)
+    assert app.cie10_match([i10x], app.parse_cie10("I10")).all()
+    assert app.format_cie10(app.parse_cie10("I10X, R99X")) == "I10X, R99X"
+
+@pytest.fixture(scope="module")
+def std():
+    causas = pd.read_csv(os.path.join(DATA, "CodigosDeMuerte.cleaned.csv"), dtype=str)
+    divipola = pd.read_excel(os.path.join(DATA, "Divipola.xlsx"), engine="openpyxl")
+    std, dims = app.standardize(generate(20_000, data_dir=DATA), causas, divipola)
+    previous = app.DATA.peek()
+    app.DATA.swap(app.DataVersion("test-cie10", std, dims))
+    try:
+        yield std
+    finally:
+        if previous is not None:
+            app.DATA.swap(previous)
+
+def test_conteos_incluyen_codigos_con_x(std):
+    codes = std["COD_CAUSA"].astype(str)
+    padded = codes[codes.str.endswith("X")]
+    assert len(padded)
+    code = padded.value_counts().index[0]
+    for spec, expected in ((code[:3], codes.str.startswith(code[:3]).sum()), (code, (codes == code).sum())):
+        out = app.query_counts([], {}, app.parse_cie10(spec))
+        assert int(out["TOTAL"].sum()) == expected
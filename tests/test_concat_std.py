@@ -0,0 +1,20 @@
+# tests/test_concat_std.py
+import os, sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+
+def test_tipos_mezclados_conservan_los_faltantes():
+    numero = pd.DataFrame({"SEXO": pd.array([1, None], dtype="Int8")})
+    texto = pd.DataFrame({"SEXO": pd.Series(["M"], dtype="category")})
+    sexo = app.concat_std([numero, texto])["SEXO"]
+    assert list(sexo.cat.categories) == ["1", "M"]
+    assert sexo.isna().tolist() == [False, True, False]
+
+def test_filtro_numerico_sobre_columna_de_texto():
+    sexo = pd.Series(["1", None, "M"], dtype="category")
+    assert app._isin(sexo, [1]).tolist() == [True, False, False]
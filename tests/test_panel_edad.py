@@ -0,0 +1,47 @@
+# tests/test_panel_edad.py
+import os, sys, json
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+from tools.synth_eevv import generate
+
+DATA = os.path.join(ROOT, "data")
+
+def _panel_edad(rows):
+    """`panel_edad(2019)` sobre un dataset sintético de `rows` filas publicado como versión vigente."""
+    causas = pd.read_csv(os.path.join(DATA, "CodigosDeMuerte.cleaned.csv"), dtype=str)
+    divipola = pd.read_excel(os.path.join(DATA, "Divipola.xlsx"), engine="openpyxl")
+    std, dims = app.standardize(generate(rows, data_dir=DATA), causas, divipola)
+    app.DATA.swap(app.DataVersion(f"test-{rows}", std, dims))
+    return app.panel_edad(2019)
+
+@pytest.fixture(scope="module")
+def figures():
+    previous = app.DATA.peek()
+    try:
+        yield _panel_edad(2_000), _panel_edad(50_000)
+    finally:
+        if previous is not None:
+            app.DATA.swap(previous)
+
+def test_once_barras(figures):
+    for fig in figures:
+        assert len(fig["data"]) == 1
+        assert len(fig["data"][0]["x"]) == len(app.AGE_ORDER) == 11
+
+def test_payload_no_depende_de_las_filas(figures):
+    small, big = figures
+    assert sum(small["data"][0]["y"]) == 2_000
+    assert sum(big["data"][0]["y"]) == 50_000
+    # Solo cambian los conteos (y con ellos sus dígitos): sin ellos el JSON es idéntico
+    def shape(fig):
+        fig = json.loads(app.to_json_plotly(fig))
+        fig["data"][0]["y"] = [0] * len(fig["data"][0]["y"])
+        return app.to_json_plotly(fig)
+    assert len(shape(small)) == len(shape(big))
+    assert len(app.to_json_plotly(big)) - len(app.to_json_plotly(small)) <= 11 * 2
@@ -0,0 +1,202 @@
+# tools/bench.py
+import os, sys, json, time, argparse, platform, subprocess, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Callbacks medidos: (panel, Output, entradas)
+PANELS = [
+    ("mapa",      "mapa-deptos.figure",          ["year"]),
+    ("linea",     "linea-mensual.figure",        ["year"]),
+    ("violencia", "barras-violencia.figure",     ["year", "codes"]),
+    ("pie",       "pie-ciudades-menor.figure",   ["year"]),
+    ("tabla",     "tabla-causas.data",           ["year"]),
+    ("sexo",      "barras-apiladas-sexo.figure", ["year"]),
+    ("edad",      "histograma-edad.figure",      ["year"]),
+]
+
+# Métricas comparadas entre corridas (más alto = peor)
+COMPARED = ("load_s", "cube_s", "peak_rss_mb", "cold_ms", "warm_ms", "bytes")
+
+def parse_scale(text):
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+def _callback_body(output, inputs, year, codes):
+    values = {"year": ("year-dd", year), "codes": ("homicide-codes", codes)}
+    cid, prop = output.split(".")
+    return {
+        "output": output,
+        "outputs": {"id": cid, "property": prop},
+        "inputs": [{"id": values[i][0], "property": "value", "value": values[i][1]} for i in inputs],
+        "changedPropIds": [f"{values[inputs[0]][0]}.value"],
+    }
+
+def peak_rss_mb():
+    """RSS pico del proceso. En Linux usa VmHWM: ru_maxrss se hereda a través de exec."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+
+def run_one(year, codes):
+    """Mide en este proceso (DATA_DIR/SNAPSHOT_PATH ya configurados por el padre)."""
+    t0 = time.perf_counter()
+    import app
+    import_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    std, _, _ = app.load_data()
+    load_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    app.load_cube()
+    cube_s = time.perf_counter() - t0
+
+    client = app.server.test_client()
+    # Una pasada previa para que los imports perezosos de plotly no se carguen al primer panel
+    for _, output, inputs in PANELS:
+        client.post("/_dash-update-component", json=_callback_body(output, inputs, year, codes))
+
+    panels = {}
+    for name, output, inputs in PANELS:
+        body = _callback_body(output, inputs, year, codes)
+        app.PANEL_CACHE.clear()
+        t0 = time.perf_counter()
+        resp = client.post("/_dash-update-component", json=body)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        client.post("/_dash-update-component", json=body)
+        warm = time.perf_counter() - t0
+        if resp.status_code != 200:
+            raise RuntimeError(f"{name}: HTTP {resp.status_code}")
+        panels[name] = {"cold_ms": cold * 1000, "warm_ms": warm * 1000, "bytes": len(resp.data)}
+
+    return {
+        "rows": len(std),
+        "import_s": import_s,
+        "load_s": load_s,
+        "cube_s": cube_s,
+        "peak_rss_mb": peak_rss_mb(),
+        "panels": panels,
+    }
+
+def _dataset(workdir, rows, fmt, seed):
+    """Genera (o reutiliza) el dataset sintético de `rows` filas en `fmt`."""
+    from tools.synth_eevv import write_dataset
+    out_dir = os.path.join(workdir, f"{fmt}-{rows}-s{seed}")
+    target = os.path.join(out_dir, "NoFetal2019.xlsx" if fmt == "xlsx" else "snapshot")
+    if not os.path.exists(target):
+        t0 = time.perf_counter()
+        write_dataset(rows, out_dir, fmt=fmt, seed=seed)
+        print(f"  generado {target} ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+    return out_dir
+
+def bench_case(workdir, rows, fmt, seed, year, codes):
+    """Corre una escala/formato en un proceso nuevo (RSS pico y tiempos de arranque limpios)."""
+    from tools.synth_eevv import EXCEL_MAX_ROWS
+    if fmt == "xlsx" and rows > EXCEL_MAX_ROWS:
+        return {"skipped": f"Excel admite hasta {EXCEL_MAX_ROWS:,} filas"}
+    data_dir = _dataset(workdir, rows, fmt, seed)
+    env = dict(os.environ, DATA_DIR=data_dir, PRELOAD_DATA="0", WARM_START="0")
+    if fmt == "xlsx":
+        env["USE_SNAPSHOT"] = "0"  # mide el parseo del Excel, no el snapshot
+        env.pop("SNAPSHOT_PATH", None)
+    else:
+        env["SNAPSHOT_PATH"] = os.path.join(data_dir, "snapshot")
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-one", "--year", str(year), "--codes", codes]
+    out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _flatten(result):
+    flat = {k: result[k] for k in COMPARED if k in result}
+    for name, metrics in result.get("panels", {}).items():
+        for k, v in metrics.items():
+            flat[f"{name}.{k}"] = v
+    return flat
+
+def compare(old, new, threshold, min_ms=5.0):
+    """Regresiones de `new` frente a `old`: métricas que empeoran más de `threshold` (relativo).
+
+    Las latencias por debajo de `min_ms` se ignoran: a esa escala domina el ruido.
+    """
+    old_cases = {(r["rows"], r["format"]): r for r in old["results"]}
+    regressions = []
+    for r in new["results"]:
+        prev = old_cases.get((r["rows"], r["format"]))
+        if not prev or "result" not in prev or "result" not in r:
+            continue
+        a, b = _flatten(prev["result"]), _flatten(r["result"])
+        for k in sorted(set(a) & set(b)):
+            if k.endswith("_ms") and b[k] < min_ms:
+                continue
+            if a[k] > 0 and b[k] > a[k] * (1 + threshold):
+                regressions.append((r["rows"], r["format"], k, a[k], b[k]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga y callbacks con datos EEVV sintéticos.")
+    parser.add_argument("--scales", default="100k,1M,10M", help="Filas por caso, p.ej. 100k,1M,10M.")
+    parser.add_argument("--formats", default="xlsx,snapshot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--year", type=int, default=2019)
+    parser.add_argument("--codes", default="X93,X94,X95,Y09")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "mortalidad-bench"),
+                        help="Dónde se guardan (y reutilizan) los datasets generados.")
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para detectar regresiones.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento relativo tolerado (0.2 = 20%%).")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="Latencias menores no cuentan como regresión.")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(args.year, args.codes)))
+        return
+
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    report = {
+        "meta": {"git": rev, "python": platform.python_version(), "machine": platform.machine(),
+                 "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": [],
+    }
+    for rows in (parse_scale(s) for s in args.scales.split(",") if s.strip()):
+        for fmt in (f.strip() for f in args.formats.split(",") if f.strip()):
+            print(f"{rows:>11,} filas · {fmt}", file=sys.stderr)
+            result = bench_case(args.workdir, rows, fmt, args.seed, args.year, args.codes)
+            case = {"rows": rows, "format": fmt}
+            case["result" if "rows" in result else "note"] = result
+            report["results"].append(case)
+            if "rows" in result:
+                slow = max(result["panels"].items(), key=lambda kv: kv[1]["cold_ms"])
+                print(f"  carga {result['load_s']:.2f}s · cubo {result['cube_s']:.2f}s · RSS {result['peak_rss_mb']:.0f} MB"
+                      f" · panel más lento {slow[0]} {slow[1]['cold_ms']:.0f} ms", file=sys.stderr)
+            else:
+                print(f"  {result}", file=sys.stderr)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Listo: {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        regressions = compare(old, report, args.threshold, args.min_ms)
+        for rows, fmt, k, a, b in regressions:
+            print(f"REGRESIÓN {rows:,} {fmt} {k}: {a:.4g} -> {b:.4g}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# tools/build_snapshot.py
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["WARM_START"] = "0"  # este proceso solo arma el snapshot: sin hilo de arranque
+import app
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-construye el snapshot columnar de los datos de mortalidad.")
+    parser.add_argument("--force", action="store_true", help="Reconstruye aunque ya exista un snapshot vigente.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    path = app.build_snapshot(force=args.force)
+    print(f"Huella: {app.data_fingerprint()}")
+    print(f"Listo: {path} ({time.perf_counter() - t0:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,28 @@
-
 # tools/make_geojson.py
-import json, os, re, unicodedata, requests, pandas as pd
+import json, os, argparse, pandas as pd, numpy as np
 
 DATA_DIR = os.environ.get("DATA_DIR", "data")
 DIVIPOLA_XLSX = os.path.join(DATA_DIR, "Divipola.xlsx")
 OUT_GEOJSON   = os.path.join(DATA_DIR, "colombia_departamentos.geojson")
+OUT_MPIOS_DIR = os.path.join(DATA_DIR, "mpios")
 
 # Fuente GeoJSON base (departamentos). Puedes cambiar a otra fuente si prefieres.
 SRC_URL = "https://raw.githubusercontent.com/caticoa3/colombia_mapa/master/co_2018_MGN_DPTO_POLITICO.geojson"
+# Fuente municipal (--mpios): mismo MGN, nivel municipio
+MPIO_SRC_URL = "https://raw.githubusercontent.com/caticoa3/colombia_mapa/master/co_2018_MGN_MPIO_POLITICO.geojson"
+
+CAND_CODE_KEYS = ["COD_DEPTO","DPTO_CCDGO","DPTO","CODIGO_DEPTO","DPTO_CCDGO","MPIO_CDPTO"]
+CAND_NAME_KEYS = ["NOM_DEPTO","DEPARTAMEN","DPTO_CNMBR","DEPARTAMENTO","NOMBRE_DEPTO","NOMBRE_DPT"]
+CAND_DANE_KEYS = ["MPIO_CDPMP","COD_DANE","CODIGO_DANE"]             # 5 dígitos: depto*1000 + mpio
+CAND_MPIO_KEYS = ["COD_MPIO","MPIO_CCDGO","COD_MUNICIPIO","CODIGO_MPIO"]  # 3 dígitos dentro del depto
+CAND_MPIO_NAME_KEYS = ["NOM_MPIO","MPIO_CNMBR","MUNICIPIO","NOMBRE_MPIO","MPIO_NOM"]
 
-def norm(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s)
-    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
-    s = re.sub(r"[^A-Za-z0-9 ]+", " ", s).strip().upper()
-    s = re.sub(r"\s+", " ", s)
-    return s
+def norm(s: pd.Series) -> pd.Series:
+    """Normaliza nombres (sin tildes, solo alfanuméricos, mayúsculas) de forma vectorizada."""
+    s = s.fillna("").astype(str)
+    s = s.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    s = s.str.replace(r"[^A-Za-z0-9 ]+", " ", regex=True).str.strip().str.upper()
+    return s.str.replace(r"\s+", " ", regex=True)
 
 def pick(df, candidates):
     for c in candidates:
@@ -24,9 +30,251 @@ def pick(df, candidates):
             return c
     return None
 
+def read_source(source):
+    """Lee el GeoJSON base desde un archivo local o, si es una URL, lo descarga."""
+    if os.path.exists(source):
+        print(f"Leyendo: {source}")
+        with open(source, "r", encoding="utf-8") as f:
+            return json.load(f)
+    if not source.startswith(("http://", "https://")):
+        raise SystemExit(f"No se encontró {source}.")
+    import requests
+    print(f"Descargando: {source}")
+    r = requests.get(source, timeout=60)
+    r.raise_for_status()
+    return r.json()
+
+def _numeric(props, keys):
+    codes = pd.Series(np.nan, index=props.index)
+    for k in keys:
+        if k in props.columns:
+            codes = codes.fillna(pd.to_numeric(props[k].astype(str).str.strip(), errors="coerce"))
+    return codes
+
+def assign_codes(features, divi_use):
+    """Asigna properties.COD_DEPTO: primero por columnas de código, luego por nombre normalizado."""
+    props = pd.DataFrame([f.setdefault("properties", {}) for f in features])
+
+    codes = _numeric(props, CAND_CODE_KEYS)
+
+    names = pd.Series(pd.NA, index=props.index, dtype=object)
+    for k in CAND_NAME_KEYS:
+        if k in props.columns:
+            names = names.fillna(props[k].where(props[k].astype(bool) & props[k].notna()))
+    name_to_code = divi_use.dropna().drop_duplicates("NORM_NOM").set_index("NORM_NOM")["COD_DEPTO"]
+    codes = codes.fillna(norm(names.astype(str).str.strip()).map(name_to_code).astype(float))
+
+    for feat, code in zip(features, codes):
+        if pd.notna(code):
+            feat["properties"]["COD_DEPTO"] = int(code)
+    return int(codes.isna().sum())
+
+def assign_mpio_codes(features, divi_mpio):
+    """Asigna properties.COD_DEPTO/COD_MPIO/NOM_MPIO a la capa municipal.
+
+    Primero por el código DANE de 5 dígitos, luego por departamento + código de 3 dígitos y
+    por último por departamento + nombre normalizado; el nombre final sale de DIVIPOLA.
+    """
+    props = pd.DataFrame([f.setdefault("properties", {}) for f in features])
+    depto = pd.Series([f["properties"].get("COD_DEPTO") for f in features], index=props.index, dtype=float)
+
+    dane = _numeric(props, CAND_DANE_KEYS)
+    depto = depto.fillna(dane // 1000)
+    mpio = (dane % 1000).fillna(_numeric(props, CAND_MPIO_KEYS) % 1000)
+
+    names = pd.Series(pd.NA, index=props.index, dtype=object)
+    for k in CAND_MPIO_NAME_KEYS:
+        if k in props.columns:
+            names = names.fillna(props[k].where(props[k].astype(bool) & props[k].notna()))
+    by_name = divi_mpio.dropna().drop_duplicates(["COD_DEPTO", "NORM_NOM"]).set_index(["COD_DEPTO", "NORM_NOM"])["COD_MPIO"]
+    keys = pd.MultiIndex.from_arrays([depto.astype("Int64"), norm(names.astype(str).str.strip())])
+    mpio = mpio.fillna(pd.Series(by_name.reindex(keys).to_numpy(dtype=float), index=props.index))
+
+    known = divi_mpio.set_index(["COD_DEPTO", "COD_MPIO"])["NOM_MPIO"]
+    for feat, d, m, name in zip(features, depto, mpio, names):
+        if pd.notna(d) and pd.notna(m):
+            feat["properties"] = {
+                "COD_DEPTO": int(d), "COD_MPIO": int(m),
+                "NOM_MPIO": known.get((int(d), int(m)), name if isinstance(name, str) else ""),
+            }
+    return int((depto.isna() | mpio.isna()).sum())
+
+# --------------------------------------------------------------------------------------
+# Geometría: cuantización + simplificación que preserva topología
+# --------------------------------------------------------------------------------------
+def _rings(geom):
+    """Anillos (listas de [x, y]) de un Polygon/MultiPolygon, en orden."""
+    if geom["type"] == "Polygon":
+        return list(geom["coordinates"])
+    if geom["type"] == "MultiPolygon":
+        return [ring for poly in geom["coordinates"] for ring in poly]
+    return []
+
+def _set_rings(geom, rings):
+    it = iter(rings)
+    if geom["type"] == "Polygon":
+        geom["coordinates"] = [next(it) for _ in geom["coordinates"]]
+    elif geom["type"] == "MultiPolygon":
+        geom["coordinates"] = [[next(it) for _ in poly] for poly in geom["coordinates"]]
+
+def _vertex_count(feat):
+    return sum(len(r) for r in _rings(feat["geometry"]))
+
+def _douglas_peucker(pts, tol):
+    """Índices que conserva Douglas-Peucker sobre `pts` (extremos siempre incluidos)."""
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = pts[b] - pts[a]
+        rel = pts[a + 1:b] - pts[a]
+        norm_ = np.hypot(*seg)
+        if norm_ == 0:
+            d = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            d = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / norm_
+        i = int(np.argmax(d))
+        if d[i] > tol:
+            m = a + 1 + i
+            keep[m] = True
+            stack.extend([(a, m), (m, b)])
+    return np.flatnonzero(keep)
+
+class Topology:
+    """Anillos cuantizados partidos en arcos entre vértices de unión.
+
+    Un vértice es de unión si en el grafo de aristas (no dirigido) de todos los anillos su
+    grado es distinto de 2: ahí empieza o termina una frontera compartida. Cada arco se
+    simplifica siempre en la misma orientación canónica, así que las dos caras de una
+    frontera compartida quedan idénticas y no aparecen huecos ni solapes.
+    """
+
+    def __init__(self, rings, precision):
+        scale = 10 ** precision
+        self.scale = scale
+        self.rings = []
+        for ring in rings:
+            q = np.round(np.asarray(ring, dtype=float)[:, :2] * scale).astype(np.int64)
+            if len(q) > 1:
+                q = q[np.r_[True, np.any(q[1:] != q[:-1], axis=1)]]  # sin duplicados consecutivos
+            if len(q) > 1 and (q[0] != q[-1]).any():
+                q = np.vstack([q, q[:1]])
+            self.rings.append(q)
+
+        # Grado de cada punto en el grafo de aristas no dirigidas
+        keys = [self._keys(q) for q in self.rings]
+        edges = np.concatenate([np.stack([k[:-1], k[1:]], axis=1) for k in keys if len(k) > 1] or
+                               [np.empty((0, 2), dtype=np.int64)])
+        edges = np.unique(np.sort(edges, axis=1), axis=0)
+        pts, deg = np.unique(edges.ravel(), return_counts=True)
+        self.junctions = set(pts[deg != 2].tolist())
+        self.keys = keys
+
+    @staticmethod
+    def _keys(q):
+        return (q[:, 0] << 32) + (q[:, 1] & 0xFFFFFFFF)
+
+    def _simplify_arc(self, arc, keys, tol):
+        # Orientación canónica: la misma frontera recorrida al revés da el mismo resultado
+        flip = (keys[0], keys[1] if len(keys) > 1 else 0) > (keys[-1], keys[-2] if len(keys) > 1 else 0)
+        pts = arc[::-1] if flip else arc
+        kept = pts[_douglas_peucker(pts.astype(float), tol)]
+        return kept[::-1] if flip else kept
+
+    def simplified(self, tolerance):
+        """Anillos simplificados (tolerancia en grados) como listas de [lon, lat]."""
+        tol = tolerance * self.scale
+        out = []
+        for q, k in zip(self.rings, self.keys):
+            if len(q) < 4 or tol <= 0:
+                out.append(q)
+                continue
+            ring, rk = q[:-1], k[:-1]
+            cuts = [i for i, key in enumerate(rk.tolist()) if key in self.junctions]
+            if not cuts:
+                cuts = [int(np.argmin(rk))]  # anillo aislado: arranca en su punto canónico
+            ring, rk = np.roll(ring, -cuts[0], axis=0), np.roll(rk, -cuts[0])
+            cuts = [c - cuts[0] for c in cuts] + [len(ring)]
+            ring, rk = np.vstack([ring, ring[:1]]), np.r_[rk, rk[:1]]
+            parts = [self._simplify_arc(ring[a:b + 1], rk[a:b + 1], tol)[:-1] for a, b in zip(cuts[:-1], cuts[1:])]
+            new = np.vstack(parts + [ring[:1]])
+            out.append(new if len(new) >= 4 else q)  # no colapsar anillos pequeños
+        return [[[float(x) / self.scale, float(y) / self.scale] for x, y in r] for r in out]
+
+def simplify_features(features, precision, tolerance, topo=None):
+    """Copia de `features` con geometría cuantizada y simplificada; devuelve (features, topología)."""
+    if topo is None:
+        topo = Topology([r for f in features for r in _rings(f["geometry"])], precision)
+    rings = iter(topo.simplified(tolerance))
+    out = []
+    for f in features:
+        geom = {"type": f["geometry"]["type"], "coordinates": f["geometry"]["coordinates"]}
+        _set_rings(geom, [next(rings) for _ in _rings(f["geometry"])])
+        out.append({**f, "geometry": geom})
+    return out, topo
+
+def write_geojson(gjson, features, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({**gjson, "features": features}, f, ensure_ascii=False, separators=(",", ":"))
+    return os.path.getsize(path)
+
+def report(original, simplified, name_keys):
+    """Tabla de vértices y bytes por feature."""
+    rows = []
+    for f0, f1 in zip(original, simplified):
+        props = f1["properties"]
+        name = next((props[k] for k in name_keys if props.get(k)), "")
+        rows.append({
+            "COD": props.get("COD_DEPTO"), "NOMBRE": name,
+            "VERTICES_ORIG": _vertex_count(f0), "VERTICES": _vertex_count(f1),
+            "BYTES": len(json.dumps(f1, ensure_ascii=False, separators=(",", ":")).encode("utf-8")),
+        })
+    return pd.DataFrame(rows).sort_values("COD")
+
+def write_mpios(gjson, features, out_dir, precision, tolerance):
+    """Simplifica la capa municipal con una sola topología y escribe <out_dir>/<COD_DEPTO>.geojson.
+
+    La topología se arma sobre todo el país: las fronteras entre municipios vecinos de
+    departamentos distintos quedan idénticas aunque terminen en archivos separados.
+    """
+    simplified, _ = simplify_features(features, precision, tolerance)
+    by_depto = {}
+    for f0, f1 in zip(features, simplified):
+        by_depto.setdefault(f1["properties"]["COD_DEPTO"], []).append((f0, f1))
+    rows = []
+    for depto, pairs in sorted(by_depto.items()):
+        path = os.path.join(out_dir, f"{depto:02d}.geojson")
+        size = write_geojson(gjson, [f1 for _, f1 in pairs], path)
+        rows.append({
+            "COD_DEPTO": depto, "MUNICIPIOS": len(pairs),
+            "VERTICES_ORIG": sum(_vertex_count(f0) for f0, _ in pairs),
+            "VERTICES": sum(_vertex_count(f1) for _, f1 in pairs), "BYTES": size,
+        })
+    return pd.DataFrame(rows)
+
 def main():
+    parser = argparse.ArgumentParser(description="Genera el GeoJSON departamental con properties.COD_DEPTO.")
+    parser.add_argument("--source", help="Archivo GeoJSON local o URL (por defecto, la fuente pública).")
+    parser.add_argument("--divipola", default=DIVIPOLA_XLSX)
+    parser.add_argument("--out", default=OUT_GEOJSON)
+    parser.add_argument("--precision", type=int, default=4, help="Decimales de las coordenadas (4 ≈ 11 m).")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Tolerancia de simplificación en grados (0 = sin simplificar).")
+    parser.add_argument("--levels", default="",
+                        help="Tolerancias extra separadas por coma; escribe <out>.lod<i>.geojson por cada una.")
+    parser.add_argument("--mpios", action="store_true",
+                        help="Capa municipal: un <COD_DEPTO>.geojson por departamento en --mpios-dir.")
+    parser.add_argument("--mpios-dir", default=OUT_MPIOS_DIR)
+    parser.add_argument("--quiet", action="store_true", help="No imprime la tabla por departamento.")
+    args = parser.parse_args()
+    source = args.source or (MPIO_SRC_URL if args.mpios else SRC_URL)
+
     # 1) DIVIPOLA
-    divi = pd.read_excel(DIVIPOLA_XLSX, engine="openpyxl")
+    divi = pd.read_excel(args.divipola, engine="openpyxl")
     divi.columns = [c.strip().upper() for c in divi.columns]
 
     col_dep_code = pick(divi, ["COD_DEPTO","COD_DPTO","DPTO","CODIGO_DEPTO","COD_DEPARTAMENTO"])
@@ -37,63 +285,61 @@ def main():
     divi_use = divi[[col_dep_code, col_dep_name]].drop_duplicates()
     divi_use = divi_use.rename(columns={col_dep_code:"COD_DEPTO", col_dep_name:"NOM_DEPTO"})
     divi_use["COD_DEPTO"] = pd.to_numeric(divi_use["COD_DEPTO"], errors="coerce").astype("Int64")
-    divi_use["NORM_NOM"]  = divi_use["NOM_DEPTO"].map(norm)
+    divi_use["NORM_NOM"]  = norm(divi_use["NOM_DEPTO"])
 
-    # 2) Descargar GeoJSON base
-    print(f"Descargando: {SRC_URL}")
-    r = requests.get(SRC_URL, timeout=60)
-    r.raise_for_status()
-    gjson = r.json()
-
-    # 3) Mapear COD_DEPTO a properties
-    CAND_CODE_KEYS = ["COD_DEPTO","DPTO_CCDGO","DPTO","CODIGO_DEPTO","DPTO_CCDGO","MPIO_CDPTO"]
-    CAND_NAME_KEYS = ["NOM_DEPTO","DEPARTAMEN","DPTO_CNMBR","DEPARTAMENTO","NOMBRE_DEPTO","NOMBRE_DPT"]
-
-    name_to_code = {row["NORM_NOM"]: int(row["COD_DEPTO"]) for _, row in divi_use.dropna().iterrows()}
-    not_matched = 0
-
-    for feat in gjson.get("features", []):
-        props = feat.setdefault("properties", {})
-        dep_code = None
-        dep_name = None
-
-        for k in CAND_CODE_KEYS:
-            if k in props and props[k] not in (None, ""):
-                try:
-                    dep_code = int(str(props[k]).strip())
-                    break
-                except:
-                    pass
-
-        for k in CAND_NAME_KEYS:
-            if k in props and props[k]:
-                dep_name = str(props[k]).strip()
-                break
-
-        if dep_code is not None:
-            props["COD_DEPTO"] = dep_code
-            continue
+    # 2) GeoJSON base (local u online)
+    gjson = read_source(source)
+    features = gjson.get("features", [])
 
-        if dep_name:
-            key = norm(dep_name)
-            if key in name_to_code:
-                props["COD_DEPTO"] = name_to_code[key]
-                continue
+    # 3) Mapear COD_DEPTO (y, con --mpios, COD_MPIO) a properties
+    not_matched = assign_codes(features, divi_use)
+    if args.mpios:
+        col_mun_code = pick(divi, ["COD_MPIO","COD_MUNICIPIO","MUNI","CODIGO_MPIO"])
+        col_mun_name = pick(divi, ["NOM_MPIO","MUNICIPIO","MPIO_NOM"])
+        if not col_mun_code or not col_mun_name:
+            raise SystemExit("No encuentro columnas de código/nombre de municipio en Divipola.xlsx")
+        divi_mpio = divi[[col_dep_code, col_mun_code, col_mun_name]].drop_duplicates()
+        divi_mpio.columns = ["COD_DEPTO", "COD_MPIO", "NOM_MPIO"]
+        divi_mpio["COD_DEPTO"] = pd.to_numeric(divi_mpio["COD_DEPTO"], errors="coerce").astype("Int64")
+        divi_mpio["COD_MPIO"] = (pd.to_numeric(divi_mpio["COD_MPIO"], errors="coerce") % 1000).astype("Int64")
+        divi_mpio["NORM_NOM"] = norm(divi_mpio["NOM_MPIO"])
 
-        not_matched += 1
+        not_matched = assign_mpio_codes(features, divi_mpio)
+        print(f"Municipios sin COD_DEPTO/COD_MPIO asignado: {not_matched}")
+        missing = [f for f in features if "COD_MPIO" not in f.get("properties", {})]
+        if missing:
+            print("Ejemplo de feature sin COD_MPIO -> properties:", missing[0].get("properties", {}))
+            raise SystemExit(f"Faltan {len(missing)} features con COD_MPIO. Revisa normalización de nombres.")
+
+        # 4) Simplificar una vez y partir por departamento
+        table = write_mpios(gjson, features, args.mpios_dir, args.precision, args.tolerance)
+        if not args.quiet:
+            print(table.to_string(index=False))
+        print(f"Listo: {len(table)} archivos en {args.mpios_dir} ({table['BYTES'].sum():,} bytes, "
+              f"{table['VERTICES'].sum():,} vértices de {table['VERTICES_ORIG'].sum():,})")
+        return
 
     print(f"Departamentos sin COD_DEPTO asignado: {not_matched}")
-    missing = [f for f in gjson.get("features", []) if "COD_DEPTO" not in f.get("properties", {})]
+    missing = [f for f in features if "COD_DEPTO" not in f.get("properties", {})]
     if missing:
         sample = missing[0].get("properties", {})
         print("Ejemplo de feature sin COD_DEPTO -> properties:", sample)
         raise SystemExit(f"Faltan {len(missing)} features con COD_DEPTO. Revisa normalización de nombres.")
 
-    # 4) Guardar
-    os.makedirs(DATA_DIR, exist_ok=True)
-    with open(OUT_GEOJSON, "w", encoding="utf-8") as f:
-        json.dump(gjson, f, ensure_ascii=False)
-    print(f"Listo: {OUT_GEOJSON}")
+    # 4) Cuantizar/simplificar y guardar (más niveles de detalle opcionales)
+    simplified, topo = simplify_features(features, args.precision, args.tolerance)
+    size = write_geojson(gjson, simplified, args.out)
+    table = report(features, simplified, CAND_NAME_KEYS)
+    if not args.quiet:
+        print(table.to_string(index=False))
+    print(f"Listo: {args.out} ({size:,} bytes, {table['VERTICES'].sum():,} vértices de {table['VERTICES_ORIG'].sum():,})")
+
+    base, ext = os.path.splitext(args.out)
+    for i, tol in enumerate(float(t) for t in args.levels.split(",") if t.strip()):
+        lod, _ = simplify_features(features, args.precision, tol, topo)
+        path = f"{base}.lod{i}{ext}"
+        size = write_geojson(gjson, lod, path)
+        print(f"Listo: {path} (tolerancia {tol:g}: {size:,} bytes, {sum(_vertex_count(f) for f in lod):,} vértices)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+# tools/measure_map.py
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import plotly.express as px
+from plotly.io.json import to_json_plotly
+import app
+
+def full_figure(year):
+    """Forma anterior: el coroplético completo (GeoJSON incluido) en cada cambio de año."""
+    geojson = app.load_geojson()
+    _, _, dims = app.load_cube()
+    cy = app._year_cube(year)
+    tot = app.rollup(cy, ["COD_DEPTO"]).merge(dims["depto"], on="COD_DEPTO")
+    fig = px.choropleth(tot, geojson=geojson, locations="COD_DEPTO",
+                        featureidkey="properties.COD_DEPTO", color="TOTAL",
+                        hover_name="NOM_DEPTO", color_continuous_scale="Reds")
+    fig.update_geos(fitbounds="locations", visible=False)
+    return fig
+
+def timed(fn, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide bytes y tiempo de servidor por interacción del mapa.")
+    parser.add_argument("--year", type=int, default=2019)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if app.load_geojson() is None:
+        raise SystemExit("No hay GeoJSON: el mapa usa el fallback de barras.")
+    client = app.server.test_client()
+    app.load_cube()
+
+    t_full, fig = timed(lambda: to_json_plotly(full_figure(args.year)), args.repeat)
+    t_base, base = timed(lambda: to_json_plotly(app.base_map_figure()), args.repeat)
+
+    body = {
+        "output": "mapa-deptos.figure",
+        "outputs": {"id": "mapa-deptos", "property": "figure"},
+        "inputs": [{"id": "year-dd", "property": "value", "value": args.year}],
+        "changedPropIds": ["year-dd.value"],
+    }
+    app.PANEL_CACHE.clear()
+    t_patch, resp = timed(lambda: client.post("/_dash-update-component", json=body), 1)
+    t_patch_warm, resp = timed(lambda: client.post("/_dash-update-component", json=body), args.repeat)
+
+    print(f"Figura completa por interacción : {len(fig):>9,} bytes  {t_full * 1000:7.1f} ms")
+    print(f"Figura base (una vez por sesión): {len(base):>9,} bytes  {t_base * 1000:7.1f} ms")
+    print(f"Patch por interacción (frío)    : {len(resp.data):>9,} bytes  {t_patch * 1000:7.1f} ms")
+    print(f"Patch por interacción (cache)   : {len(resp.data):>9,} bytes  {t_patch_warm * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
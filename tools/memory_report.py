@@ -0,0 +1,43 @@
+# tools/memory_report.py
+import os, sys, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+import app
+
+def legacy_layout(std, dims):
+    """Reconstruye el formato anterior: códigos float64/objeto y nombres repetidos en cada fila."""
+    old = pd.DataFrame({
+        c: (std[c].astype(object) if isinstance(std[c].dtype, pd.CategoricalDtype) else std[c].astype("float64"))
+        for c in std.columns
+    })
+    old = old.merge(dims["depto"], on="COD_DEPTO", how="left")
+    old = old.merge(dims["mpio"], on=["COD_DEPTO", "COD_MPIO"], how="left")
+    old = old.merge(dims["causa"], on="COD_CAUSA", how="left")
+    return old
+
+def mb(nbytes):
+    return nbytes / 1024 ** 2
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la memoria del dataset estándar antes y después de la codificación compacta.")
+    parser.parse_args()
+
+    std, _, dims = app.load_data()
+    old = legacy_layout(std, dims)
+    new_cols = std.memory_usage(deep=True, index=False)
+    old_cols = old.memory_usage(deep=True, index=False)
+    dims_bytes = sum(d.memory_usage(deep=True, index=False).sum() for d in dims.values())
+
+    print(f"Filas: {len(std):,}")
+    print(f"{'Columna':<14}{'Anterior (MB)':>15}{'Compacto (MB)':>15}  Tipo compacto")
+    for c in old.columns:
+        new = f"{mb(new_cols[c]):>15.2f}  {std[c].dtype}" if c in new_cols else f"{'—':>15}  (tabla de dimensión)"
+        print(f"{c:<14}{mb(old_cols[c]):>15.2f}{new}")
+    total_old = old_cols.sum()
+    total_new = new_cols.sum() + dims_bytes
+    print(f"{'Dimensiones':<14}{'':>15}{mb(dims_bytes):>15.2f}")
+    print(f"{'TOTAL':<14}{mb(total_old):>15.2f}{mb(total_new):>15.2f}  ({total_old / total_new:.1f}x menos)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# tools/startup_report.py
+import os, sys, json, time, argparse, statistics, subprocess, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Métricas del reporte: (clave, encabezado)
+COLUMNS = [
+    ("import_s", "import app"),
+    ("layout_s", "layout"),
+    ("max_request_s", "petición más larga"),
+    ("first_figure_s", "primera figura"),
+    ("page_s", "página completa"),
+]
+
+def _find_props(node, cid):
+    """Props del componente `cid` dentro del JSON de /_dash-layout."""
+    if isinstance(node, list):
+        for child in node:
+            found = _find_props(child, cid)
+            if found is not None:
+                return found
+        return None
+    if not isinstance(node, dict):
+        return None
+    props = node.get("props", {})
+    if props.get("id") == cid:
+        return props
+    return _find_props(props.get("children"), cid)
+
+def _outputs(spec):
+    """Salida de Dash ("a.b" o "..a.b...c.d..") como {"id", "property"} o lista de ellos."""
+    parts = spec.strip(".").split("...") if spec.startswith("..") else [spec]
+    outs = [dict(zip(("id", "property"), p.rsplit(".", 1))) for p in parts]
+    return outs if spec.startswith("..") else outs[0]
+
+def _post(client, dep, values, changed):
+    body = {
+        "output": dep["output"], "outputs": _outputs(dep["output"]),
+        "inputs": [{**i, "value": values.get(f"{i['id']}.{i['property']}")} for i in dep["inputs"]],
+        "state": [{**s, "value": values.get(f"{s['id']}.{s['property']}")} for s in dep.get("state", [])],
+        "changedPropIds": [changed],
+    }
+    t0 = time.perf_counter()
+    resp = client.post("/_dash-update-component", json=body)
+    elapsed = time.perf_counter() - t0
+    if resp.status_code not in (200, 204):
+        raise RuntimeError(f"{dep['output']}: HTTP {resp.status_code}")
+    return (resp.get_json() or {}).get("response", {}) if resp.status_code == 200 else {}, elapsed
+
+def run_one(root, visit_after, timeout_s):
+    """Arranque y primera visita en este proceso, como los vería el navegador.
+
+    Solo usa el protocolo HTTP de Dash (layout, dependencias, callbacks), así sirve igual
+    para cualquier revisión de app.py.
+    """
+    sys.path.insert(0, root)
+    t_boot = time.perf_counter()
+    import app
+    import_s = time.perf_counter() - t_boot
+    time.sleep(visit_after)
+
+    client = app.server.test_client()
+    t0 = time.perf_counter()
+    layout = client.get("/_dash-layout").get_json()
+    layout_s = time.perf_counter() - t0
+    deps = client.get("/_dash-dependencies").get_json()
+    server_deps = [d for d in deps if not d.get("clientside_function")]
+    init = next(d for d in server_deps if "year-dd.options" in d["output"])
+    mapa = next(d for d in server_deps if d["output"] in ("mapa-deptos.figure", "..mapa-deptos.figure.."))
+    # El resto de la página: todo callback del servidor que dependa del año
+    panels = [d for d in server_deps if d is not init and d is not mapa
+              and any(f"{i['id']}.{i['property']}" == "year-dd.value" for i in d["inputs"])]
+
+    values = {}
+    for d in server_deps:
+        for dep in d["inputs"] + d.get("state", []):
+            props = _find_props(layout, dep["id"]) or {}
+            values[f"{dep['id']}.{dep['property']}"] = props.get(dep["property"])
+    values["boot-poll.n_intervals"] = 0
+    poll = _find_props(layout, "boot-poll") or {}
+    longest, changed, polls = 0.0, "year-dd.value", 0
+    while True:
+        resp, elapsed = _post(client, init, values, changed)
+        longest = max(longest, elapsed)
+        if "options" in resp.get("year-dd", {}):
+            values["year-dd.value"] = resp["year-dd"]["value"]
+            break
+        if time.perf_counter() - t_boot > timeout_s:
+            raise RuntimeError(f"sin datos tras {timeout_s:.0f}s: {resp.get('status-msg')}")
+        time.sleep(poll.get("interval", 1000) / 1000)
+        polls += 1
+        values["boot-poll.n_intervals"] = polls
+        changed = "boot-poll.n_intervals"
+
+    _, elapsed = _post(client, mapa, values, "year-dd.value")
+    longest = max(longest, elapsed)
+    first_figure_s = time.perf_counter() - t_boot
+    for dep in panels:
+        _, elapsed = _post(client, dep, values, "year-dd.value")
+        longest = max(longest, elapsed)
+    return {
+        "import_s": import_s,
+        "layout_s": layout_s,
+        "max_request_s": longest,
+        "first_figure_s": first_figure_s,
+        "page_s": time.perf_counter() - t_boot,
+        "polls": polls,
+    }
+
+def _export(rev, workdir):
+    """Copia app.py, assets/ y tools/ de la revisión `rev` a un directorio temporal."""
+    out = tempfile.mkdtemp(prefix=f"startup-{rev.replace('/', '_')}-", dir=workdir)
+    archive = subprocess.run(["git", "archive", rev, "app.py", "assets", "tools"], cwd=ROOT, capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", out], input=archive.stdout, check=True)
+    return out
+
+def run_case(root, data_dir, fmt, warm, args):
+    env = dict(os.environ, DATA_DIR=data_dir, PRELOAD_DATA="0", CLIENTSIDE_PANELS="0",
+               WARM_START="1" if warm else "0", DATA_WATCH_SECONDS="0")
+    if fmt == "xlsx":
+        env["USE_SNAPSHOT"] = "0"  # el arranque en frío parsea los Excel
+        env.pop("SNAPSHOT_PATH", None)
+    else:
+        env["SNAPSHOT_PATH"] = os.path.join(data_dir, "snapshot")
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-one", "--root", root,
+           "--visit-after", str(args.visit_after), "--timeout", str(args.timeout)]
+    runs = []
+    for _ in range(args.repeat):
+        out = subprocess.run(cmd, env=env, cwd=root, capture_output=True, text=True)
+        if out.returncode != 0:
+            return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de import y hasta la primera figura, con y sin WARM_START.")
+    parser.add_argument("--rows", default="100k", help="Filas del dataset sintético (p.ej. 100k, 1M).")
+    parser.add_argument("--format", choices=["xlsx", "snapshot"], default="xlsx")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Revisión de git para la columna 'antes' (p.ej. HEAD~1).")
+    parser.add_argument("--visit-after", type=float, default=0.0,
+                        help="Segundos entre el arranque y la primera visita.")
+    parser.add_argument("--repeat", type=int, default=3, help="Corridas por caso (se reporta la mediana).")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "mortalidad-bench"),
+                        help="Dónde se guardan (y reutilizan) los datasets generados.")
+    parser.add_argument("--out", default="startup.json")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--root", default=ROOT, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(args.root, args.visit_after, args.timeout)))
+        return
+
+    from tools.bench import _dataset, parse_scale
+    rows = parse_scale(args.rows)
+    data_dir = _dataset(args.workdir, rows, args.format, args.seed)
+    cases = []
+    if args.baseline:
+        cases.append((f"antes ({args.baseline})", _export(args.baseline, args.workdir), False))
+    cases += [("sin WARM_START", ROOT, False), ("WARM_START=1", ROOT, True)]
+
+    report = {"rows": rows, "format": args.format, "visit_after_s": args.visit_after, "cases": {}}
+    for name, root, warm in cases:
+        print(f"{name} …", file=sys.stderr)
+        report["cases"][name] = run_case(os.path.abspath(root), data_dir, args.format, warm, args)
+
+    width = max(len(n) for n in report["cases"])
+    print(f"{rows:,} filas · {args.format} · visita a los {args.visit_after:g}s")
+    print(" " * width + "".join(f"{title:>20}" for _, title in COLUMNS))
+    for name, result in report["cases"].items():
+        if "error" in result:
+            print(f"{name:<{width}}  error: {result['error']}")
+            continue
+        print(f"{name:<{width}}" + "".join(f"{result[k]:>19.3f}s" for k, _ in COLUMNS))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Listo: {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# tools/synth_eevv.py
+import os, sys, argparse, shutil
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+
+# Límite de filas de una hoja de Excel (sin contar el encabezado)
+EXCEL_MAX_ROWS = 1_048_575
+
+# Peso relativo de cada GRUPO_EDAD1 (0–29): la carga se concentra en vejez, con un pico
+# neonatal y otro menor de adultos jóvenes (violencias)
+AGE_WEIGHTS = np.array([
+    1.6, 0.5, 0.4, 0.3, 0.6,    # 0–4   neonatal
+    0.9, 0.4,                   # 5–6   infantil
+    0.3, 0.3,                   # 7–8   primera infancia
+    0.3, 0.4,                   # 9–10  niñez
+    0.8,                        # 11    adolescencia
+    2.2, 2.6,                   # 12–13 juventud
+    2.6, 2.7, 2.9,              # 14–16 adultez temprana
+    3.3, 4.0, 5.0,              # 17–19 adultez intermedia
+    6.2, 7.4, 8.6, 9.6, 10.3,   # 20–24 vejez
+    9.8, 7.6, 4.4, 1.6,         # 25–28 longevidad
+    0.4,                        # 29    edad desconocida
+])
+
+# Capitales con peso extra (COD_DEPTO, COD_MPIO): Bogotá, Medellín, Cali, Barranquilla, Cartagena, Bucaramanga
+BIG_CITIES = {(11, 1): 120.0, (5, 1): 45.0, (76, 1): 40.0, (8, 1): 22.0, (13, 1): 15.0, (68, 1): 10.0}
+
+# Códigos de homicidio que reciben una fracción fija de las muertes
+VIOLENT_CODES = ["X954", "X950", "X959", "X994", "X999", "Y099", "X934", "X940"]
+
+def _divipola(data_dir):
+    divi = pd.read_excel(os.path.join(data_dir, "Divipola.xlsx"), engine="openpyxl")
+    divi.columns = [c.strip().upper() for c in divi.columns]
+    return divi.rename(columns={"COD_DEPARTAMENTO": "COD_DEPTO", "COD_MUNICIPIO": "COD_MPIO"})
+
+def _causes(data_dir):
+    return pd.read_csv(os.path.join(data_dir, "CodigosDeMuerte.cleaned.csv"), dtype=str)["COD_CAUSA"].dropna().to_numpy()
+
+def generate(n, years=(2019,), seed=0, data_dir=DATA_DIR):
+    """Frame sintético con la forma de NoFetal (mismos encabezados que detecta `COLS`).
+
+    Determinista para un mismo (n, years, seed). Municipios reales de DIVIPOLA con pesos
+    lognormales (más las capitales grandes), causas con sesgo Zipf sobre el catálogo real y
+    GRUPO_EDAD1 según AGE_WEIGHTS.
+    """
+    rng = np.random.default_rng(seed)
+    divi = _divipola(data_dir)
+    w = rng.lognormal(0.0, 1.2, len(divi))
+    for (d, m), boost in BIG_CITIES.items():
+        w[((divi["COD_DEPTO"] == d) & (divi["COD_MPIO"] == m)).to_numpy()] *= boost
+    muni = rng.choice(len(divi), size=n, p=w / w.sum())
+
+    codes = _causes(data_dir)
+    ranks = rng.permutation(len(codes)) + 1
+    pz = 1.0 / ranks ** 1.1
+    cause = codes[rng.choice(len(codes), size=n, p=pz / pz.sum())]
+    violent = rng.random(n) < 0.1
+    cause[violent] = rng.choice(VIOLENT_CODES, size=int(violent.sum()))
+
+    age = rng.choice(len(AGE_WEIGHTS), size=n, p=AGE_WEIGHTS / AGE_WEIGHTS.sum())
+    return pd.DataFrame({
+        "COD_DPTO": divi["COD_DEPTO"].to_numpy()[muni],
+        "COD_MUNICIPIO": divi["COD_MPIO"].to_numpy()[muni],
+        "AÑO": rng.choice(np.asarray(years), size=n),
+        "MES": rng.integers(1, 13, size=n),
+        "SEXO": rng.choice([1, 2, 3], size=n, p=[0.555, 0.444, 0.001]),
+        "GRUPO_EDAD1": age,
+        "COD_MUERTE": cause,
+    })
+
+def _write_xlsx(df, path):
+    tmp = f"{path[:-len('.xlsx')]}.tmp-{os.getpid()}.xlsx"
+    df.to_excel(tmp, index=False, engine="openpyxl")
+    os.replace(tmp, path)  # un archivo a medio escribir nunca queda con el nombre final
+
+def write_dataset(n, out_dir, fmt="xlsx", years=(2019,), seed=0, data_dir=DATA_DIR, split_years=False):
+    """Escribe un DATA_DIR sintético completo en `out_dir`.
+
+    `fmt="xlsx"` escribe NoFetal2019.xlsx (hasta EXCEL_MAX_ROWS filas; con `split_years`, un
+    NoFetal<año>.xlsx por año, para MORTALITY_FILE="NoFetal*.xlsx"); `fmt="snapshot"` escribe
+    directamente el snapshot columnar (`out_dir/snapshot`, para SNAPSHOT_PATH) sin pasar por Excel.
+    Devuelve la ruta del archivo/directorio de mortalidad generado.
+    """
+    import app
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ("Divipola.xlsx", "CodigosDeMuerte.xlsx", "CodigosDeMuerte.cleaned.csv"):
+        shutil.copy2(os.path.join(data_dir, name), os.path.join(out_dir, name))
+    geojson = os.path.join(data_dir, "colombia_departamentos.geojson")
+    if os.path.exists(geojson):
+        shutil.copy2(geojson, os.path.join(out_dir, "colombia_departamentos.geojson"))
+    mpios = os.path.join(data_dir, "mpios")
+    if os.path.isdir(mpios):
+        shutil.copytree(mpios, os.path.join(out_dir, "mpios"), dirs_exist_ok=True)
+
+    df = generate(n, years=years, seed=seed, data_dir=data_dir)
+    if fmt == "xlsx" and split_years:
+        for year, part in df.groupby("AÑO"):
+            if len(part) > EXCEL_MAX_ROWS:
+                raise ValueError(f"Excel admite hasta {EXCEL_MAX_ROWS:,} filas por año; usa fmt='snapshot'.")
+            _write_xlsx(part, os.path.join(out_dir, f"NoFetal{year}.xlsx"))
+        return os.path.join(out_dir, "NoFetal*.xlsx")
+    if fmt == "xlsx":
+        if n > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel admite hasta {EXCEL_MAX_ROWS:,} filas; usa fmt='snapshot'.")
+        path = os.path.join(out_dir, "NoFetal2019.xlsx")
+        _write_xlsx(df, path)
+        return path
+    if fmt == "snapshot":
+        causas = pd.read_csv(os.path.join(out_dir, "CodigosDeMuerte.cleaned.csv"), dtype=str)
+        divipola = pd.read_excel(os.path.join(out_dir, "Divipola.xlsx"), engine="openpyxl")
+        path = os.path.join(out_dir, "snapshot")
+        shutil.rmtree(path, ignore_errors=True)
+        app.write_snapshot(*app.standardize(df, causas, divipola), path)
+        return path
+    raise ValueError(f"Formato desconocido: {fmt}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera microdatos EEVV sintéticos con la forma de NoFetal2019.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", choices=["xlsx", "snapshot"], default="xlsx")
+    parser.add_argument("--years", default="2019", help="Años separados por coma.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--split-years", action="store_true", help="Con xlsx, un NoFetal<año>.xlsx por año.")
+    args = parser.parse_args()
+
+    years = tuple(int(y) for y in args.years.split(","))
+    path = write_dataset(args.rows, args.out_dir, fmt=args.format, years=years, seed=args.seed,
+                         split_years=args.split_years)
+    print(f"Listo: {path}")
+
+if __name__ == "__main__":
+    main()